@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, status
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.jwt import admin_required
+from app.books.catalog import catalog
+from app.books.utils import FastJSONResponse
+from db.slow_queries import slow_query_log
+
+router = APIRouter(dependencies=[Depends(admin_required)])
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(limit: int = 50):
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "threshold_ms": slow_query_log.threshold_ms,
+            "shapes": slow_query_log.report(limit),
+        },
+    )
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    slow_query_log.clear()
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content={"message": "Slow query log cleared"}
+    )
+
+
+@router.get("/catalog")
+async def get_catalog_stats():
+    # Measuring the footprint walks a sample of records, keep it off the loop.
+    # The snapshot is taken on the loop, so no refresh can change the dict
+    # while it is copied, and the thread only walks this list
+    records = list(catalog.records.values())
+    stats = await run_in_threadpool(catalog.stats, records)
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content=stats)
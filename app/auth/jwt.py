@@ -0,0 +1,45 @@
+import hashlib
+import time
+from typing import Dict, Optional, Union
+
+from bson import ObjectId
+from fastapi import Depends, HTTPException, status
+from fastapi_jwt_auth import AuthJWT as BaseAuthJWT
+
+from app.user.models import Role
+from app.user.services import get_user_by_id
+from core.cache import TTLCache
+from core.config import settings
+from core.metrics import register_cache
+
+# Decoded claims of tokens whose signature was already checked, keyed by digest
+verified_tokens = TTLCache(settings.JWT_CACHE_SIZE, settings.JWT_CACHE_TTL)
+register_cache("jwt", verified_tokens)
+
+
+class AuthJWT(BaseAuthJWT):
+    """AuthJWT that skips the signature check for tokens it verified recently.
+
+    Entries never outlive the token's own ``exp``, so expiry is still enforced
+    by re-verifying once the cached claims run out.
+    """
+
+    def _verified_token(
+        self, encoded_token: str, issuer: Optional[str] = None
+    ) -> Dict[str, Union[str, int, bool]]:
+        key = hashlib.sha256(f"{issuer}:{encoded_token}".encode()).digest()
+        raw_token = verified_tokens.get(key)
+        if raw_token is not None and raw_token.get("exp", 0) > time.time():
+            return dict(raw_token)
+        raw_token = super()._verified_token(encoded_token, issuer)
+        if "exp" in raw_token:
+            verified_tokens.set(key, raw_token)
+        return dict(raw_token)
+
+
+async def admin_required(authorize: AuthJWT = Depends()):
+    authorize.jwt_required()
+    user = await get_user_by_id(ObjectId(authorize.get_jwt_subject()))
+    if user is None or user.get("role") != Role.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return user
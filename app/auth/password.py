@@ -1,9 +1,22 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Tuple
 
 from passlib import pwd
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from core.config import settings
+from core.metrics import PASSWORD_HASH_LATENCY
+
+# Hashes below BCRYPT_ROUNDS are flagged by verify_and_update and rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+_executor: Executor | None = None
 
 
 def verify_and_update(
@@ -18,3 +31,40 @@ def get_password_hash(password: str) -> str:
 
 def generate() -> str:
     return pwd.genword()
+
+
+def get_executor() -> Executor:
+    """Pool running bcrypt, created lazily so every worker process owns its own."""
+    global _executor
+    if _executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="bcrypt",
+            )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def async_verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, str | None]:
+    loop = asyncio.get_running_loop()
+    with PASSWORD_HASH_LATENCY.labels("verify").time():
+        return await loop.run_in_executor(
+            get_executor(), verify_and_update, plain_password, hashed_password
+        )
+
+
+async def async_get_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    with PASSWORD_HASH_LATENCY.labels("hash").time():
+        return await loop.run_in_executor(get_executor(), get_password_hash, password)
@@ -1,10 +1,10 @@
 from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 from pydash import pick
 
-from app.auth.password import get_password_hash, verify_and_update
+from app.auth.jwt import AuthJWT
+from app.auth.password import async_get_password_hash, async_verify_and_update
 from app.user.models import UserChangePasswordModel, UserLoginModel
 from app.user.services import get_user_by_id, read_user_by_username, update_user
 
@@ -20,7 +20,7 @@ async def login(body: UserLoginModel, authorize: AuthJWT = Depends()):
             detail="Username or password is valid",
         )
 
-    verified, updated_password_hash = verify_and_update(
+    verified, updated_password_hash = await async_verify_and_update(
         body.password, user["hashed_password"]
     )
 
@@ -32,7 +32,7 @@ async def login(body: UserLoginModel, authorize: AuthJWT = Depends()):
 
     # Update password has to a more robust one if needed
     if updated_password_hash is not None:
-        await update_user(user["_id"], {"hashed_password": user["hashed_password"]})
+        await update_user(user["_id"], {"hashed_password": updated_password_hash})
 
     access_token = authorize.create_access_token(subject=str(user["_id"]))
     refresh_token = authorize.create_refresh_token(subject=str(user["_id"]))
@@ -58,7 +58,7 @@ async def change_user_password(
             detail="Username or password is valid",
         )
 
-    verified = verify_and_update(body.password, user["hashed_password"])
+    verified = await async_verify_and_update(body.password, user["hashed_password"])
 
     if not verified or verified[0] is False:
         raise HTTPException(
@@ -67,7 +67,7 @@ async def change_user_password(
         )
 
     # TODO: check schemas password
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await async_get_password_hash(body.new_password)
     try:
         await update_user(user_id, {"hashed_password": hashed_password})
     except:
@@ -0,0 +1,346 @@
+import asyncio
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.books.services import BOOK_HIDDEN_FIELDS, client
+from app.books.utils import decode_cursor, to_json
+from core.config import settings
+from core.logging import logger
+from core.static import static_url, static_urls
+
+# Fields kept in slots, anything else a document carries goes to ``extra``
+RECORD_FIELDS = (
+    "_id",
+    "title",
+    "author",
+    "category",
+    "price",
+    "release_date",
+    "page_number",
+    "cover",
+    "cover_variants",
+    "average_rate",
+    "rating_count",
+    "rating_sum",
+    "describe",
+    "created_at",
+    "rating",
+)
+SLOTS = {"_id": "id"}
+# Code of "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# Fields the list view filters on, matched case-insensitively like the regexes
+FILTER_FIELDS = ("title", "author", "category")
+
+
+class BookRecord:
+    """One book of the replica, already converted to its JSON values."""
+
+    __slots__ = (
+        "oid",
+        *(SLOTS.get(field, field) for field in RECORD_FIELDS),
+        "extra",
+        *(f"{field}_key" for field in FILTER_FIELDS),
+    )
+
+    def __init__(self, doc: dict):
+        self.oid = doc["_id"]
+        doc = to_json(doc)
+        for field in RECORD_FIELDS:
+            setattr(self, SLOTS.get(field, field), doc.pop(field, None))
+        for hidden in BOOK_HIDDEN_FIELDS:
+            doc.pop(hidden, None)
+        self.extra = doc or None
+        for field in FILTER_FIELDS:
+            value = getattr(self, field)
+            setattr(
+                self, f"{field}_key", value.casefold() if isinstance(value, str) else ""
+            )
+
+    def get(self, field: str):
+        if field in RECORD_FIELDS:
+            return getattr(self, SLOTS.get(field, field))
+        return (self.extra or {}).get(field)
+
+    def to_dict(self, fields: list[str] | None = None) -> dict:
+        book = {}
+        for field in fields or RECORD_FIELDS:
+            name, _, path = field.partition(".")
+            value = self.get(name)
+            if value is not None and path:
+                value = project(value, path.split("."))
+            if value is not None:
+                book[name] = merge(book[name], value) if name in book else value
+        if fields is None and self.extra:
+            book.update(self.extra)
+        book["_id"] = self.id
+        if book.get("cover"):
+            book["cover"] = static_url(book["cover"])
+        if book.get("cover_variants"):
+            book["cover_variants"] = static_urls(book["cover_variants"])
+        return book
+
+
+def project(value, parts: list[str]):
+    """What a Mongo inclusion projection of ``parts`` keeps of ``value``.
+
+    Arrays are walked element by element and lose their scalars, documents
+    without the field become empty ones, None means nothing is kept.
+    """
+    if isinstance(value, list):
+        return [
+            projected
+            for item in value
+            if isinstance(item, (dict, list))
+            and (projected := project(item, parts)) is not None
+        ]
+    if not isinstance(value, dict):
+        return None
+    head, rest = parts[0], parts[1:]
+    if head not in value:
+        return {}
+    if not rest:
+        return {head: value[head]}
+    inner = project(value[head], rest)
+    return {} if inner is None else {head: inner}
+
+
+def merge(left, right):
+    """Combine two projections of the same value, e.g. of a.b and a.c."""
+    if isinstance(left, dict) and isinstance(right, dict):
+        for key, value in right.items():
+            left[key] = merge(left[key], value) if key in left else value
+        return left
+    if isinstance(left, list) and isinstance(right, list):
+        return [merge(a, b) for a, b in zip(left, right)]
+    return right
+
+
+def deep_size(value, seen: set) -> int:
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif isinstance(value, BookRecord):
+        size += sum(
+            deep_size(getattr(value, slot), seen) for slot in BookRecord.__slots__
+        )
+    return size
+
+
+class CatalogReplica:
+    """In-process copy of the books collection serving list and detail reads.
+
+    Kept fresh by a change stream when the deployment has one (replica set),
+    otherwise by reloading every CATALOG_POLL_INTERVAL seconds. It is only
+    used while its staleness is under CATALOG_MAX_STALENESS.
+    """
+
+    def __init__(self):
+        self.records: dict[str, BookRecord] = {}
+        self.ordered: list[BookRecord] = []
+        self.oids: list[ObjectId] = []
+        self.dirty = False
+        self.mode = None
+        self.loaded_at = None
+        self.synced_at = None
+        self.load_seconds = None
+        self.events = 0
+        self.task: asyncio.Task | None = None
+
+    @property
+    def staleness(self) -> float | None:
+        if self.synced_at is None:
+            return None
+        return time.time() - self.synced_at
+
+    @property
+    def ready(self) -> bool:
+        staleness = self.staleness
+        return staleness is not None and staleness <= settings.CATALOG_MAX_STALENESS
+
+    async def start(self):
+        operation_time = await self.operation_time()
+        await self.load()
+        self.task = asyncio.create_task(self.run(operation_time))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def operation_time(self):
+        """Cluster time to start the change stream at, None without one."""
+        if not settings.CATALOG_CHANGE_STREAMS:
+            return None
+        try:
+            result = await client.database.command("ping")
+        except PyMongoError:
+            return None
+        return result.get("operationTime")
+
+    async def load(self):
+        started = time.time()
+        records = {}
+        async for book in client.find({}, {"search": 0}).batch_size(1000):
+            record = BookRecord(book)
+            records[record.id] = record
+        self.records = records
+        self.dirty = True
+        self.loaded_at = self.synced_at = started
+        self.load_seconds = time.time() - started
+
+    async def refresh(self, book_id):
+        """Re-read one book after a local write, so this worker sees it at once."""
+        if self.task is None:
+            return
+        book = await client.find_one({"_id": ObjectId(book_id)}, {"search": 0})
+        if book is None:
+            self.records.pop(str(book_id), None)
+        else:
+            self.records[str(book_id)] = BookRecord(book)
+        self.dirty = True
+
+    async def run(self, operation_time):
+        reload = False
+        while True:
+            try:
+                if reload:
+                    operation_time = await self.operation_time()
+                    await self.load()
+                    reload = False
+                if operation_time is not None:
+                    self.mode = "change_stream"
+                    await self.follow_changes(operation_time)
+                    # The stream was closed, start over from a fresh copy
+                    reload = True
+                    continue
+                self.mode = "polling"
+                await asyncio.sleep(settings.CATALOG_POLL_INTERVAL)
+                await self.load()
+            except Exception as error:
+                if (
+                    isinstance(error, OperationFailure)
+                    and error.code == CHANGE_STREAMS_UNSUPPORTED
+                ):
+                    logger.warning(f"Catalog change stream unavailable: {error}")
+                    operation_time = None
+                    continue
+                logger.error(f"Catalog replica sync failed: {error}")
+                await asyncio.sleep(settings.CATALOG_POLL_INTERVAL)
+                reload = True
+
+    async def follow_changes(self, operation_time):
+        async with client.watch(
+            full_document="updateLookup",
+            start_at_operation_time=operation_time,
+            max_await_time_ms=1000,
+        ) as stream:
+            while stream.alive:
+                change = await stream.try_next()
+                if change is None:
+                    # Caught up with the server, nothing pending
+                    self.synced_at = time.time()
+                    continue
+                self.apply(change)
+
+    def apply(self, change: dict):
+        self.events += 1
+        operation = change["operationType"]
+        if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.records = {}
+        elif operation == "delete":
+            self.records.pop(str(change["documentKey"]["_id"]), None)
+        elif change.get("fullDocument") is not None:
+            book = change["fullDocument"]
+            self.records[str(book["_id"])] = BookRecord(book)
+        elif operation in ("update", "replace"):
+            # Deleted again before the lookup
+            self.records.pop(str(change["documentKey"]["_id"]), None)
+        self.dirty = True
+
+    def sorted_records(self) -> list[BookRecord]:
+        if self.dirty:
+            self.ordered = sorted(self.records.values(), key=lambda record: record.oid)
+            self.oids = [record.oid for record in self.ordered]
+            self.dirty = False
+        return self.ordered
+
+    def get(self, book_id: str) -> dict | None:
+        record = self.records.get(str(book_id))
+        return record.to_dict() if record is not None else None
+
+    def page(
+        self,
+        title: str,
+        author: str,
+        category: str,
+        skip: int,
+        limit: int,
+        cursor: str | None,
+        fields: list[str],
+    ) -> tuple[list[dict], int]:
+        """Same page and total as the Mongo query of get_books, by _id order."""
+        records = self.sorted_records()
+        oids = self.oids
+        needles = [
+            (f"{field}_key", value.casefold())
+            for field, value in zip(FILTER_FIELDS, (title, author, category))
+            if value
+        ]
+        if needles:
+            matched = [
+                index
+                for index, record in enumerate(records)
+                if all(needle in getattr(record, key) for key, needle in needles)
+            ]
+        else:
+            matched = range(len(records))
+        if cursor is not None:
+            start = 0
+            if cursor:
+                start = bisect_right(oids, decode_cursor(cursor)[1])
+            selected = matched[bisect_left(matched, start) :]
+            selected = selected[:limit] if limit > 0 else selected
+        else:
+            offset = (skip - 1) * limit if skip > 0 else 0
+            selected = matched[offset : offset + limit if limit > 0 else None]
+        return [records[index].to_dict(fields) for index in selected], len(matched)
+
+    def stats(self, records: list[BookRecord]) -> dict:
+        """``records`` is a snapshot taken on the loop, which keeps changing them."""
+        sample = random.sample(records, min(len(records), 1000))
+        seen = set()
+        per_record = sum(deep_size(record, seen) for record in sample) / (
+            len(sample) or 1
+        )
+        return {
+            "enabled": settings.CATALOG_REPLICA_ENABLED,
+            "ready": self.ready,
+            "mode": self.mode,
+            "books": len(records),
+            "change_events": self.events,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "synced_at": self.synced_at,
+            "staleness_seconds": self.staleness,
+            "max_staleness_seconds": settings.CATALOG_MAX_STALENESS,
+            "memory_bytes_estimate": int(per_record * len(records)),
+            "memory_bytes_per_book": int(per_record),
+        }
+
+
+catalog = CatalogReplica()
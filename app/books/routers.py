@@ -1,25 +1,34 @@
-from functools import reduce
+import asyncio
 from typing import Optional
 
 from bson import ObjectId
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Body
-from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
 
+from app.auth.jwt import AuthJWT
+from app.books.catalog import catalog
 from app.books.models import AddBookModel, RatingModel, UpdateModel, BookModel
 from app.books.services import (
+    BOOK_ENTITY_FIELDS,
+    BOOK_HIDDEN_FIELDS,
+    book_entity,
     book_delete,
+    books_filter,
     count_books,
     create_book,
+    find_books_after_cursor,
     find_books_by_filter_and_paginate,
     find_by_id,
     rating_book,
     update_book,
-    find_books_not_paginate,
+    search_books,
+    set_cover_variants,
+    text_filter,
 )
-from app.user.services import get_user
-
-# from fastapi_jwt_auth import AuthJWT
+from app.books.utils import FastJSONResponse, next_cursor, parse_fields
+from app.user.services import get_usernames
+from core.images import queue_variants
+from core.static import static_url
+from core.storage import check_upload_size, save_upload
 
 from db.init_db import get_collection_client
 
@@ -30,40 +39,81 @@ client = get_collection_client("books")
 
 @router.get("/")
 async def get_books(
+    search: str = "",
     title: str = "",
     author: str = "",
     category: str = "",
     skip: int = 1,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: str = "",
 ):
-    query = {}
-    if title:
-        query["title"] = {"$regex": title, "$options": "i"}
-    if author:
-        query["author"] = {"$regex": author, "$options": "i"}
-    if category:
-        query["category"] = {"$regex": category, "$options": "i"}
-    books = await find_books_by_filter_and_paginate(query, skip, limit)
-    count = await count_books(query)
-    return JSONResponse(
+    # Only the requested (or lean default) fields ever leave Mongo
+    names = parse_fields(fields, BOOK_ENTITY_FIELDS, BOOK_HIDDEN_FIELDS)
+    projection = book_entity(names)
+    # Plain listings come from the in-process replica while it is fresh enough
+    if not search and catalog.ready:
+        books, count = catalog.page(
+            title,
+            author,
+            category,
+            skip,
+            limit,
+            cursor,
+            names,
+        )
+        return FastJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "result": books,
+                "total_record": count,
+                "next_cursor": next_cursor(books, limit),
+            },
+        )
+    query = books_filter(title, author, category)
+    # Full text search is ranked by relevance, so it only pages with skip/limit
+    if search:
+        books, count = await asyncio.gather(
+            search_books(search, query, skip, limit, projection),
+            count_books(text_filter(search, query)),
+        )
+        return FastJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"result": books, "total_record": count, "next_cursor": None},
+        )
+    # Any cursor value (even empty for the first page) switches to keyset paging
+    if cursor is not None:
+        page = find_books_after_cursor(query, cursor, limit, projection)
+    else:
+        page = find_books_by_filter_and_paginate(query, skip, limit, projection)
+    books, count = await asyncio.gather(page, count_books(query))
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"result": books, "total_record": count},
+        content={
+            "result": books,
+            "total_record": count,
+            "next_cursor": next_cursor(books, limit),
+        },
     )
 
 
 @router.post("/")
 async def add_new_book(body: AddBookModel):
-    await create_book(body)
-    return JSONResponse(
+    book = await create_book(body)
+    await catalog.refresh(book["_id"])
+    return FastJSONResponse(
         status_code=status.HTTP_201_CREATED, content="Add new book successful"
     )
 
 
 @router.get("/{id}")
 async def get_detail(id: str):
-    detail = await find_by_id(id)
+    detail = catalog.get(id) if catalog.ready else None
+    if detail is None:
+        # Not in the replica yet, e.g. created by another worker since the last poll
+        detail = await find_by_id(id)
     if detail:
-        return JSONResponse(status_code=status.HTTP_200_OK, content=detail)
+        return FastJSONResponse(status_code=status.HTTP_200_OK, content=detail)
     return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not found")
 
 
@@ -72,26 +122,24 @@ async def get_book_rate(
     id: str,
 ):
     book = await find_by_id(id)
-    all_rate = []
     all_comment = []
-    if "rating" not in book:
-        return JSONResponse(
+    if not book or not book.get("rating"):
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "average_rate": 0,
                 "comment_rate": [],
             },
         )
+    # Resolve every rater in a single query, deleted users get a null username
+    usernames = await get_usernames(item["user_id"] for item in book["rating"])
     for item in book["rating"]:
-        all_rate.append(item["rate"])
-        user = await get_user(item["user_id"])
-        item["username"] = user["username"]
+        item["username"] = usernames.get(item["user_id"])
         all_comment.append(item)
-    average_rate = reduce(lambda a, b: a + b, all_rate) / len(all_rate)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "average_rate": average_rate,
+            "average_rate": book.get("average_rate", 0),
             "comment_rate": all_comment,
         },
     )
@@ -116,13 +164,13 @@ async def get_book_rate(
 #     )
 
 
-@router.post("/cover")
+@router.post("/cover", dependencies=[Depends(check_upload_size)])
 async def upload_cover(id: str, file: UploadFile = File(...)):
     book_id = ObjectId(id)
     try:
-        content = await file.read()
-        with open(f"static/bookscover/{file.filename}", "wb") as f:
-            f.write(content)
+        cover = await save_upload(file, "bookscover")
+    except HTTPException:
+        raise
     except Exception as error:
         return HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,10 +178,12 @@ async def upload_cover(id: str, file: UploadFile = File(...)):
         )
     finally:
         await file.close()
-    await update_book(book_id, {"cover": f"static/bookscover/{file.filename}"})
-    return JSONResponse(
+    await update_book(book_id, {"cover": cover, "cover_variants": {}})
+    await catalog.refresh(book_id)
+    queue_variants(cover, lambda variants: set_cover_variants(book_id, cover, variants))
+    return FastJSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
-        content=f"static/bookscover/{file.filename}",
+        content=static_url(cover),
     )
 
 
@@ -148,37 +198,28 @@ async def rate_book(
     rate = rate_comment.rate
     comment = rate_comment.comment
     await rating_book(id, rate, comment, user_id)
-    return JSONResponse(
+    await catalog.refresh(id)
+    return FastJSONResponse(
         status_code=status.HTTP_201_CREATED,
         content="Successfull rate the book",
     )
 
 
-# @router.get("/all")
-# async def get_all(title: str = ""):
-#     query = {}
-#     if title:
-#         query = {"title": {"$regex": f"{title}", "$options": "i"}}
-#     books = await find_books_not_paginate(query)
-#     return JSONResponse(
-#         status_code=status.HTTP_200_OK,
-#         content=books,
-#     )
-
-
 @router.put("/{id}")
 async def edit_book(id: str, data: UpdateModel = Body(...)):
     data = {k: v for k, v in data.dict().items() if v is not None}
     updated_book = await update_book(ObjectId(id), data)
+    await catalog.refresh(id)
     if updated_book is None:
         return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
 
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
+    return FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
 
 
 @router.delete("/{id}")
 async def delete_book(id: str):
     deleted = await book_delete(id)
+    await catalog.refresh(id)
     if deleted is not True:
         return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
+    return FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
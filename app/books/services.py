@@ -1,58 +1,269 @@
+import copy
+import re
+
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ASCENDING, IndexModel, TEXT, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
-from app.books.utils import to_json
-from db.init_db import get_collection_client
+from app.books.utils import after_cursor, normalize_search, to_json
+from core.cache import TTLCache, make_key
+from core.config import settings
+from core.metrics import register_cache
+from core.static import static_url, static_urls
+from db.init_db import get_collection_client, register_indexes
 
 client = get_collection_client("books")
+count_cache = TTLCache(settings.COUNT_CACHE_SIZE, settings.COUNT_CACHE_TTL)
+book_cache = TTLCache(
+    settings.CACHE_SIZE if settings.CACHE_ENABLED else 0, settings.CACHE_TTL
+)
+register_cache("books_count", count_cache)
+register_cache("books", book_cache)
+
+# Lean representation used by list views, describe and rating stay behind
+BOOK_ENTITY_FIELDS = [
+    "_id",
+    "title",
+    "author",
+    "category",
+    "price",
+    "release_date",
+    "page_number",
+    "cover",
+    "cover_variants",
+    "average_rate",
+    "rating_count",
+]
+# Never returned by the API
+BOOK_HIDDEN_FIELDS = {"search"}
+
+# Weights of the fields indexed for full text search
+SEARCH_WEIGHTS = {"title": 10, "author": 5, "category": 2}
+
+
+def search_fields(book: dict) -> dict:
+    return {
+        f"search.{field}": normalize_search(book[field])
+        for field in SEARCH_WEIGHTS
+        if field in book
+    }
+
+
+def book_json(book) -> dict:
+    book = to_json(book)
+    if book.get("cover"):
+        book["cover"] = static_url(book["cover"])
+    if book.get("cover_variants"):
+        book["cover_variants"] = static_urls(book["cover_variants"])
+    return book
+
+
+register_indexes(
+    "books",
+    [
+        IndexModel([("title", ASCENDING)], unique=True, name="title_unique"),
+        IndexModel([("category", ASCENDING)], name="category"),
+        IndexModel(
+            [(f"search.{field}", TEXT) for field in SEARCH_WEIGHTS],
+            weights={
+                f"search.{field}": weight for field, weight in SEARCH_WEIGHTS.items()
+            },
+            default_language="none",
+            name="books_search",
+        ),
+    ],
+)
+
+
+def prepare_book(book: dict) -> dict:
+    """Add the derived search and rating aggregate fields to a new document."""
+    book = dict(book)
+    book["search"] = {
+        field: normalize_search(book.get(field)) for field in SEARCH_WEIGHTS
+    }
+    rates = [rating.get("rate") or 0 for rating in book.get("rating") or []]
+    book["rating_count"] = len(rates)
+    book["rating_sum"] = sum(rates)
+    book["average_rate"] = sum(rates) / len(rates) if rates else 0
+    return book
 
 
 async def create_book(book):
-    book_dict = book.dict()
-    existing_book = await client.find_one({"title": book_dict["title"]})
+    book_dict = prepare_book(book.dict())
+    # Still needed where old duplicated titles kept title_unique from building
+    existing_book = await client.find_one({"title": book_dict["title"]}, {"_id": 1})
     if existing_book:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Book already exist",
         )
-    created_book = await client.insert_one(book_dict)
-    return await client.find_one({"id": created_book.inserted_id})
+    # The unique title index also rejects concurrent inserts of the same title
+    try:
+        await client.insert_one(book_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Book already exist",
+        )
+    count_cache.clear()
+    return book_dict
+
+
+async def bulk_write_books(requests: list):
+    try:
+        return await client.bulk_write(requests, ordered=False)
+    finally:
+        count_cache.clear()
+        book_cache.clear()
 
 
 async def update_book(book_id: ObjectId, book):
-    return await client.update_one({"_id": book_id}, {"$set": book})
+    result = await client.update_one(
+        {"_id": book_id}, {"$set": {**book, **search_fields(book)}}
+    )
+    book_cache.pop(str(book_id))
+    return result
+
+
+async def set_cover_variants(book_id: ObjectId, cover: str, variants: dict):
+    # Skip if the cover was replaced while its variants were being built
+    await client.update_one(
+        {"_id": book_id, "cover": cover}, {"$set": {"cover_variants": variants}}
+    )
+    book_cache.pop(str(book_id))
 
 
 async def find_by_id(id: str) -> dict:
-    book_detail = await client.find_one({"_id": ObjectId(id)})
-    if book_detail:
-        book = to_json(book_detail)
-        return book
+    book = book_cache.get(str(id))
+    if book is None:
+        book_detail = await client.find_one(
+            {"_id": ObjectId(id)}, {field: 0 for field in BOOK_HIDDEN_FIELDS}
+        )
+        if not book_detail:
+            return None
+        book = book_json(book_detail)
+        book_cache.set(str(id), book)
+    # Callers decorate the result, never hand out the cached instance
+    return copy.deepcopy(book)
+
+
+async def find_books_by_ids(ids, projection=None) -> dict:
+    book_ids = list({ObjectId(id) for id in ids if ObjectId.is_valid(id)})
+    books = {}
+    if not book_ids:
+        return books
+    async for book in client.find({"_id": {"$in": book_ids}}, projection):
+        book = book_json(book)
+        books[book["_id"]] = book
+    return books
 
 
 async def find_books_by_filter_and_paginate(
     filter_books,
     skip: int,
     limit: int,
+    projection=None,
 ):
     offset = (skip - 1) * limit if skip > 0 else 0
     books = []
-    async for book in client.find(filter_books).sort("_id").skip(offset).limit(limit):
-        book = to_json(book)
+    async for book in (
+        client.find(filter_books, projection).sort("_id").skip(offset).limit(limit)
+    ):
+        book = book_json(book)
         books.append(book)
     return books
 
 
-async def find_books_not_paginate(filter_books):
+async def find_books_after_cursor(
+    filter_books, cursor: str, limit: int, projection=None
+):
+    if cursor:
+        filter_books = after_cursor(filter_books, cursor)
     books = []
-    async for book in client.find(filter_books).sort("_id"):
-        book = to_json(book)
+    async for book in client.find(filter_books, projection).sort("_id").limit(limit):
+        book = book_json(book)
         books.append(book)
     return books
 
 
+def books_filter(title: str = "", author: str = "", category: str = "") -> dict:
+    query = {}
+    if title:
+        query["title"] = {"$regex": re.escape(title), "$options": "i"}
+    if author:
+        query["author"] = {"$regex": re.escape(author), "$options": "i"}
+    if category:
+        query["category"] = {"$regex": re.escape(category), "$options": "i"}
+    return query
+
+
+def text_filter(text: str, filter_books) -> dict:
+    return {"$text": {"$search": normalize_search(text)}, **filter_books}
+
+
+async def search_books(text: str, filter_books, skip: int, limit: int, projection=None):
+    offset = (skip - 1) * limit if skip > 0 else 0
+    score = {"$meta": "textScore"}
+    projection = {**(projection or {"search": 0}), "score": score}
+    books = []
+    async for book in (
+        client.find(text_filter(text, filter_books), projection)
+        .sort([("score", score)])
+        .skip(offset)
+        .limit(limit)
+    ):
+        book = book_json(book)
+        books.append(book)
+    return books
+
+
+async def backfill_search_fields(batch_size: int = 1000) -> int:
+    updated = 0
+    requests = []
+    async for book in client.find({}, {field: 1 for field in SEARCH_WEIGHTS}):
+        fields = {f"search.{field}": "" for field in SEARCH_WEIGHTS}
+        fields.update(search_fields(book))
+        requests.append(UpdateOne({"_id": book["_id"]}, {"$set": fields}))
+        if len(requests) >= batch_size:
+            updated += (await client.bulk_write(requests, ordered=False)).modified_count
+            requests = []
+    if requests:
+        updated += (await client.bulk_write(requests, ordered=False)).modified_count
+    book_cache.clear()
+    return updated
+
+
+async def iter_books(filter_books, projection=None, batch_size: int = 500):
+    """Yield matching books one by one straight from the cursor."""
+    cursor = client.find(filter_books, projection).sort("_id").batch_size(batch_size)
+    async for book in cursor:
+        yield book_json(book)
+
+
 async def count_books(filter_books):
-    return await client.count_documents(filter_books)
+    if not filter_books and settings.COUNT_ESTIMATE_UNFILTERED:
+        return await client.estimated_document_count()
+    key = make_key(filter_books)
+    count = count_cache.get(key)
+    if count is None:
+        count = await client.count_documents(filter_books)
+        count_cache.set(key, count)
+    return count
+
+
+def rating_aggregates() -> dict:
+    return {
+        "rating_count": {"$size": "$rating"},
+        "rating_sum": {"$sum": "$rating.rate"},
+        "average_rate": {
+            "$cond": [
+                {"$gt": [{"$size": "$rating"}, 0]},
+                {"$divide": [{"$sum": "$rating.rate"}, {"$size": "$rating"}]},
+                0,
+            ]
+        },
+    }
 
 
 async def rating_book(book_id: str, rate: float, comment: str, user_id: str):
@@ -62,48 +273,55 @@ async def rating_book(book_id: str, rate: float, comment: str, user_id: str):
         "rate": rate,
         "comment": comment,
     }
-    # Find the book and its ratings
-    book = await client.find_one({"_id": book_id})
-    ratings = book.get("rating", [])
-    # Check if the user has already rated the book
-    for i, rating in enumerate(ratings):
-        if rating["user_id"] == item_rate["user_id"]:
-            if rating["rate"] == rate and rating["comment"] == comment:
-                # Rating is the same, no need to update
-                return
-            else:
-                # Replace the old rating with the new one
-                ratings[i] = item_rate
-                break
-    else:
-        # User hasn't rated the book before, add the new rating
-        ratings.append(item_rate)
-    # Update the book's ratings
-    await client.update_one({"_id": book_id}, {"$set": {"rating": ratings}})
+    # Replace the user's rating in place or append it, then refresh the
+    # aggregates, all inside one server-side update
+    ratings = {"$ifNull": ["$rating", []]}
+    new_rate = {"$literal": item_rate}
+    already_rated = {
+        "$in": [item_rate["user_id"], {"$ifNull": ["$rating.user_id", []]}]
+    }
+    replaced = {
+        "$map": {
+            "input": ratings,
+            "in": {
+                "$cond": [
+                    {"$eq": ["$$this.user_id", item_rate["user_id"]]},
+                    new_rate,
+                    "$$this",
+                ]
+            },
+        }
+    }
+    appended = {"$concatArrays": [ratings, [new_rate]]}
+    pipeline = [
+        {"$set": {"rating": {"$cond": [already_rated, replaced, appended]}}},
+        {"$set": rating_aggregates()},
+    ]
+    await client.update_one({"_id": book_id}, pipeline)
+    book_cache.pop(str(book_id))
+
+
+async def backfill_rating_aggregates() -> int:
+    result = await client.update_many(
+        {},
+        [
+            {"$set": {"rating": {"$ifNull": ["$rating", []]}}},
+            {"$set": rating_aggregates()},
+        ],
+    )
+    book_cache.clear()
+    return result.modified_count
 
 
 async def book_delete(user_id: str):
     result = await client.delete_one({"_id": ObjectId(user_id)})
+    count_cache.clear()
+    book_cache.pop(str(user_id))
     if result.deleted_count > 0:
         return True
     return False
 
 
-def book_entity(book) -> dict:
-    rating = []
-    if "rating" in book:
-        for users_id in book["rating"]:
-            rating.append(str(users_id))
-
-    return {
-        "_id": str(book["_id"]),
-        "title": str(book["title"]),
-        "author": str(book["author"]),
-        "describe": str(book["describe"]),
-        "release_date": str(book["release_date"]),
-        "page_number": str(book["page_number"]),
-        "category": str(book["category"]),
-        "cover": str(book["cover"]) if "cover" in book else None,
-        "price": str(book["price"]) if "price" in book else None,
-        "rating": rating if "rating" in book else None,
-    }
+def book_entity(fields: list[str] | None = None) -> dict:
+    """Projection of the book representation, the lean list view by default."""
+    return {field: 1 for field in fields or BOOK_ENTITY_FIELDS}
@@ -1,5 +1,14 @@
-from bson import ObjectId
+import base64
+from datetime import date, datetime
 import json
+import re
+from typing import Any
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+import orjson
+from unidecode import unidecode
 
 
 class CustomJSONEncoder(json.JSONEncoder):
@@ -9,5 +18,91 @@ class CustomJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-def to_json(objects) -> dict:
-    return json.loads(json.dumps(objects, cls=CustomJSONEncoder))
+def to_json(objects) -> Any:
+    """Convert a Mongo document into JSON-compatible values in a single pass."""
+    if isinstance(objects, dict):
+        return {key: to_json(value) for key, value in objects.items()}
+    if isinstance(objects, (list, tuple)):
+        return [to_json(value) for value in objects]
+    if isinstance(objects, ObjectId):
+        return str(objects)
+    if isinstance(objects, (datetime, date)):
+        return objects.isoformat()
+    return objects
+
+
+def bson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, also accepting raw ObjectId values."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, default=bson_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+def encode_cursor(doc: dict, sort_field: str = "_id") -> str:
+    """Opaque cursor pointing just after ``doc`` in (sort_field, _id) order."""
+    key = [doc.get(sort_field), str(doc["_id"])]
+    return base64.urlsafe_b64encode(orjson.dumps(key, default=bson_default)).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Any, ObjectId]:
+    try:
+        value, last_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, ObjectId(last_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def after_cursor(filter_spec: dict, cursor: str, sort_field: str = "_id") -> dict:
+    """Extend ``filter_spec`` with the range condition for a keyset page."""
+    value, last_id = decode_cursor(cursor)
+    if sort_field == "_id":
+        after = {"_id": {"$gt": last_id}}
+    else:
+        after = {
+            "$or": [
+                {sort_field: {"$gt": value}},
+                {sort_field: value, "_id": {"$gt": last_id}},
+            ]
+        }
+    return {"$and": [filter_spec, after]} if filter_spec else after
+
+
+def next_cursor(page: list, limit: int, sort_field: str = "_id") -> str | None:
+    if limit > 0 and len(page) == limit:
+        return encode_cursor(page[-1], sort_field)
+    return None
+
+
+def normalize_search(text: str | None) -> str:
+    """Lowercase and strip Vietnamese diacritics ("Đắc Nhân Tâm" -> "dac nhan tam")."""
+    return unidecode(text or "").lower()
+
+
+FIELD_NAME = re.compile(r"^[A-Za-z_]\w*(\.\w+)*$")
+
+
+def parse_fields(fields: str, default: list[str], hidden: set[str]) -> list[str]:
+    names = [name.strip() for name in fields.split(",") if name.strip()] or default
+    for name in names:
+        if not FIELD_NAME.match(name) or name.split(".")[0] in hidden:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid field {name}",
+            )
+    # Mongo rejects a projection holding a path and its parent (rating,
+    # rating.rate), the parent already covers the child
+    return [
+        name
+        for name in dict.fromkeys(names)
+        if not any(name.startswith(f"{other}.") for other in names)
+    ]
@@ -0,0 +1,84 @@
+from typing import Union
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app.auth.jwt import admin_required
+from app.books.services import (
+    BOOK_ENTITY_FIELDS,
+    BOOK_HIDDEN_FIELDS,
+    book_entity,
+    books_filter,
+    iter_books,
+)
+from app.books.utils import parse_fields
+from app.exports.models import ExportFormat
+from app.exports.services import csv_chunks, ndjson_chunks
+from app.user.models import Role
+from app.user.services import (
+    USER_ENTITY_FIELDS,
+    USER_HIDDEN_FIELDS,
+    iter_users,
+    user_entity,
+)
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+# Rejected up front, a bad value would only fail once the response has started
+MAX_BATCH_SIZE = 10000
+
+
+def export_response(name, documents, format: ExportFormat, fields):
+    if format == ExportFormat.csv:
+        chunks = csv_chunks(documents, fields)
+    else:
+        chunks = ndjson_chunks(documents)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "content-disposition": f'attachment; filename="{name}.{format.value}"'
+        },
+    )
+
+
+@router.get("/books")
+async def export_books(
+    format: ExportFormat = ExportFormat.ndjson,
+    fields: str = "",
+    title: str = "",
+    author: str = "",
+    category: str = "",
+    batch_size: int = Query(500, gt=0, le=MAX_BATCH_SIZE),
+):
+    names = parse_fields(fields, BOOK_ENTITY_FIELDS, BOOK_HIDDEN_FIELDS)
+    if fields or format == ExportFormat.csv:
+        projection = book_entity(names)
+    else:
+        projection = {field: 0 for field in BOOK_HIDDEN_FIELDS}
+    documents = iter_books(
+        books_filter(title, author, category), projection, batch_size
+    )
+    return export_response("books", documents, format, names)
+
+
+@router.get("/users", dependencies=[Depends(admin_required)])
+async def export_users(
+    format: ExportFormat = ExportFormat.ndjson,
+    fields: str = "",
+    role: Union[Role, None] = None,
+    batch_size: int = Query(500, gt=0, le=MAX_BATCH_SIZE),
+):
+    names = parse_fields(fields, USER_ENTITY_FIELDS, USER_HIDDEN_FIELDS)
+    if fields or format == ExportFormat.csv:
+        projection = user_entity(names)
+    else:
+        projection = {field: 0 for field in USER_HIDDEN_FIELDS}
+    query = {"role": role} if role is not None else {}
+    documents = iter_users(query, projection, batch_size)
+    return export_response("users", documents, format, names)
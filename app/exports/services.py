@@ -0,0 +1,50 @@
+import csv
+import io
+from typing import AsyncIterator
+
+import orjson
+
+from app.books.utils import bson_default
+
+# Bytes collected before a chunk is handed to the response
+CHUNK_SIZE = 64 * 1024
+
+
+def csv_value(value):
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=bson_default).decode()
+    return value
+
+
+async def ndjson_chunks(documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for document in documents:
+        buffer += orjson.dumps(document, default=bson_default)
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def csv_chunks(
+    documents: AsyncIterator[dict], fields: list[str]
+) -> AsyncIterator[bytes]:
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(fields)
+    async for document in documents:
+        row = []
+        for name in fields:
+            value = document
+            for part in name.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+            row.append(csv_value(value))
+        writer.writerow(row)
+        if text.tell() >= CHUNK_SIZE:
+            yield text.getvalue().encode()
+            text.seek(0)
+            text.truncate()
+    if text.tell():
+        yield text.getvalue().encode()
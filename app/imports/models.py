@@ -0,0 +1,22 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class ImportMode(str, Enum):
+    skip = "skip"
+    upsert = "upsert"
+
+
+class RowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: list[RowError] = []
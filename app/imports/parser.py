@@ -0,0 +1,91 @@
+import codecs
+import json
+from typing import Iterator
+
+from bson import json_util
+
+# A single document larger than this is reported instead of buffered forever
+MAX_DOCUMENT_SIZE = 16 * 1024 * 1024
+
+decoder = json.JSONDecoder(object_hook=json_util.object_hook)
+
+
+class DocumentStream:
+    """Incremental parser for a JSON array or NDJSON of documents.
+
+    Bytes are fed in chunks of any size and complete documents come out as
+    (row, document, error) tuples, so memory stays bounded by one document.
+    Mongo extended JSON ({"$oid": ...}, {"$date": ...}) is decoded. A broken
+    NDJSON line is reported and skipped; a broken array stops the stream.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._array: bool | None = None
+        self._done = False
+        self.row = 0
+
+    def feed(self, chunk: bytes) -> Iterator[tuple[int, dict | None, str | None]]:
+        self._buffer += self._decoder.decode(chunk)
+        yield from self._drain(final=False)
+
+    def close(self) -> Iterator[tuple[int, dict | None, str | None]]:
+        self._buffer += self._decoder.decode(b"", final=True)
+        yield from self._drain(final=True)
+
+    def _drain(self, final: bool):
+        if self._array is None:
+            stripped = self._buffer.lstrip()
+            if not stripped:
+                return
+            self._array = stripped.startswith("[")
+            self._buffer = stripped[1:] if self._array else stripped
+        if self._array:
+            yield from self._drain_array(final)
+        else:
+            yield from self._drain_lines(final)
+
+    def _drain_lines(self, final: bool):
+        lines = self._buffer.split("\n")
+        self._buffer = "" if final else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            self.row += 1
+            try:
+                yield self.row, decoder.decode(line), None
+            except ValueError as error:
+                yield self.row, None, f"Invalid JSON: {error}"
+        if len(self._buffer) > MAX_DOCUMENT_SIZE:
+            self.row += 1
+            self._buffer = ""
+            yield self.row, None, "Document too large"
+
+    def _drain_array(self, final: bool):
+        buffer = self._buffer
+        position = 0
+        try:
+            while not self._done:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position == len(buffer):
+                    return
+                if buffer[position] == "]":
+                    self._done = True
+                    return
+                try:
+                    document, position = decoder.raw_decode(buffer, position)
+                except ValueError as error:
+                    # Usually the document continues in the next chunk
+                    if final or len(buffer) - position > MAX_DOCUMENT_SIZE:
+                        self.row += 1
+                        self._done = True
+                        yield self.row, None, f"Invalid JSON, import stopped: {error}"
+                    return
+                self.row += 1
+                yield self.row, document, None
+        finally:
+            # Cut the consumed documents once per chunk, not after each one
+            self._buffer = "" if self._done else buffer[position:]
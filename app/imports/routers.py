@@ -0,0 +1,67 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from fastapi.responses import StreamingResponse
+import orjson
+
+from app.auth.jwt import admin_required
+from app.imports.models import ImportMode
+from app.imports.services import import_documents
+
+router = APIRouter()
+
+CHUNK_SIZE = 256 * 1024
+# Rejected up front, a bad value would only fail once the response has started
+MAX_BATCH_SIZE = 10000
+
+
+async def read_chunks(file: UploadFile):
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def import_lines(kind: str, file: UploadFile, mode: ImportMode, batch_size: int):
+    """NDJSON body: one progress line per written batch, then the full report."""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_progress(report):
+        await queue.put(report.dict(exclude={"errors"}))
+
+    task = asyncio.create_task(
+        import_documents(kind, read_chunks(file), mode, batch_size, on_progress)
+    )
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (progress := await queue.get()) is not None:
+            yield orjson.dumps({"progress": progress}) + b"\n"
+        report = await task
+        yield orjson.dumps({"report": report.dict()}) + b"\n"
+    finally:
+        # The client went away: batches already written are kept
+        if not task.done():
+            task.cancel()
+        await file.close()
+
+
+@router.post("/books", dependencies=[Depends(admin_required)])
+async def import_books(
+    mode: ImportMode = ImportMode.skip,
+    batch_size: int = Query(1000, gt=0, le=MAX_BATCH_SIZE),
+    file: UploadFile = File(...),
+):
+    return StreamingResponse(
+        import_lines("books", file, mode, batch_size),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/users", dependencies=[Depends(admin_required)])
+async def import_users(
+    mode: ImportMode = ImportMode.skip,
+    batch_size: int = Query(1000, gt=0, le=MAX_BATCH_SIZE),
+    file: UploadFile = File(...),
+):
+    return StreamingResponse(
+        import_lines("users", file, mode, batch_size),
+        media_type="application/x-ndjson",
+    )
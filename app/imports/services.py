@@ -0,0 +1,145 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.auth.password import async_get_password_hash
+from app.books.services import bulk_write_books, prepare_book
+from app.books.services import client as books_client
+from app.imports.models import ImportMode, ImportReport, RowError
+from app.imports.parser import DocumentStream
+from app.user.services import bulk_write_users
+from app.user.services import client as users_client
+
+# Fields that must be strings when present, they are indexed and normalized
+TEXT_FIELDS = {
+    "books": ("title", "author", "category"),
+    "users": ("username",),
+}
+# Only the first errors are kept so a bad 1M row file stays cheap to report
+MAX_REPORTED_ERRORS = 1000
+
+
+async def prepare_books(books: list[dict]) -> list[dict]:
+    return [prepare_book(book) for book in books]
+
+
+async def prepare_users(users: list[dict]) -> list[dict]:
+    """Hash plain passwords of the batch in parallel on the bcrypt pool."""
+    plain = [user for user in users if "password" in user]
+    hashes = await asyncio.gather(
+        *(async_get_password_hash(str(user["password"])) for user in plain)
+    )
+    for user, hashed_password in zip(plain, hashes):
+        user["hashed_password"] = hashed_password
+        user.pop("password")
+    return users
+
+
+IMPORTS = {
+    "books": ("title", books_client, prepare_books, bulk_write_books),
+    "users": ("username", users_client, prepare_users, bulk_write_users),
+}
+
+
+def upsert_request(key: str, document: dict, mode: ImportMode) -> UpdateOne:
+    if mode == ImportMode.skip:
+        return UpdateOne({key: document[key]}, {"$setOnInsert": document}, upsert=True)
+    # _id is immutable, it only applies when the document is new
+    fields = {name: value for name, value in document.items() if name != "_id"}
+    update = {"$set": fields}
+    if "_id" in document:
+        update["$setOnInsert"] = {"_id": document["_id"]}
+    return UpdateOne({key: document[key]}, update, upsert=True)
+
+
+def add_error(report: ImportReport, row: int, error: str):
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(RowError(row=row, error=error))
+
+
+async def write_batch(
+    kind: str, batch: list[tuple[int, dict]], mode: ImportMode, report: ImportReport
+):
+    key, client, prepare, bulk_write = IMPORTS[kind]
+    if mode == ImportMode.skip:
+        # Leave out existing rows before preparing, e.g. bcrypt hashing them
+        keys = [document[key] for _, document in batch]
+        existing = {
+            document[key]
+            async for document in client.find({key: {"$in": keys}}, {key: 1})
+        }
+        kept = [
+            (row, document) for row, document in batch if document[key] not in existing
+        ]
+        report.skipped += len(batch) - len(kept)
+        batch = kept
+        if not batch:
+            return
+    documents = await prepare([document for _, document in batch])
+    requests = [upsert_request(key, document, mode) for document in documents]
+    try:
+        result = await bulk_write(requests)
+        details = result.bulk_api_result
+    except BulkWriteError as error:
+        details = error.details
+        for write_error in details.get("writeErrors", []):
+            add_error(report, batch[write_error["index"]][0], write_error["errmsg"])
+    inserted = details.get("nUpserted", 0)
+    report.inserted += inserted
+    if mode == ImportMode.upsert:
+        report.updated += details.get("nMatched", 0)
+    else:
+        report.skipped += details.get("nMatched", 0)
+
+
+async def import_documents(
+    kind: str,
+    chunks: AsyncIterator[bytes],
+    mode: ImportMode = ImportMode.skip,
+    batch_size: int = 1000,
+    on_progress: Callable[[ImportReport], Awaitable] | None = None,
+) -> ImportReport:
+    """Parse ``chunks`` incrementally and write them in unordered bulk batches.
+
+    Rows are matched on title (books) or username (users): ``skip`` leaves
+    existing documents alone, ``upsert`` overwrites their fields.
+    """
+    key = IMPORTS[kind][0]
+    stream = DocumentStream()
+    report = ImportReport()
+    batch: list[tuple[int, dict]] = []
+
+    async def flush():
+        if batch:
+            await write_batch(kind, batch, mode, report)
+            batch.clear()
+            if on_progress is not None:
+                await on_progress(report)
+
+    async def handle(rows):
+        for row, document, error in rows:
+            report.processed += 1
+            if error is not None:
+                add_error(report, row, error)
+            elif not isinstance(document, dict) or not document.get(key):
+                add_error(report, row, f"Missing {key}")
+            elif invalid := [
+                field
+                for field in TEXT_FIELDS[kind]
+                if document.get(field) is not None
+                and not isinstance(document[field], str)
+            ]:
+                add_error(report, row, f"Not a string: {', '.join(invalid)}")
+            else:
+                batch.append((row, document))
+            if len(batch) >= batch_size:
+                await flush()
+
+    async for chunk in chunks:
+        await handle(stream.feed(chunk))
+    await handle(stream.close())
+    await flush()
+    return report
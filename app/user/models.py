@@ -46,3 +46,19 @@ class UserChangePasswordModel(BaseModel):
 class CartModel(BaseModel):
     book_id: str
     booksnum: int
+
+
+class CartOperation(str, Enum):
+    increment = "increment"
+    set = "set"
+    remove = "remove"
+
+
+# Each change is one pipeline stage, Mongo allows at most 1000 of them
+CART_MAX_CHANGES = 100
+
+
+class CartChangeModel(BaseModel):
+    book_id: str
+    booksnum: int = 0
+    op: CartOperation = CartOperation.increment
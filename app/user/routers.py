@@ -1,25 +1,43 @@
+import asyncio
+import re
 from typing import Union, List
 from bson import ObjectId
 from fastapi import APIRouter, Body, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
-from fastapi_jwt_auth import AuthJWT
-
-from app.auth.password import get_password_hash
-from app.books.services import find_by_id
-from app.books.utils import to_json
-from app.user.models import Role, UserCreateModel, UserUpdateModel, CartModel
+from pymongo.errors import DuplicateKeyError
+
+from app.auth.jwt import AuthJWT
+from app.auth.password import async_get_password_hash
+from app.books.services import find_books_by_ids
+from app.books.utils import FastJSONResponse, next_cursor, parse_fields
+from app.user.models import (
+    CART_MAX_CHANGES,
+    CartChangeModel,
+    CartModel,
+    Role,
+    UserCreateModel,
+    UserUpdateModel,
+)
 from app.user.services import (
+    USER_ENTITY_FIELDS,
+    USER_HIDDEN_FIELDS,
+    apply_cart_changes,
     count_users,
     create_user,
     delete_user,
     find_user_by_id,
     get_user,
     get_users,
+    get_users_after_cursor,
+    set_avatar_variants,
     update_user,
     user_entity,
+    user_json,
     add_to_cart,
     delete_from_cart,
 )
+from core.images import queue_variants
+from core.static import static_url
+from core.storage import check_upload_size, save_upload
 from db.init_db import get_collection_client
 
 router = APIRouter()
@@ -34,13 +52,18 @@ async def create_new_user(body: UserCreateModel):
     existing_user = await client.find_one({"username": user_dict["username"]})
 
     if existing_user:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_409_CONFLICT, content="User already exist"
         )
-    user_dict["hashed_password"] = get_password_hash(user_dict["password"])
+    user_dict["hashed_password"] = await async_get_password_hash(user_dict["password"])
     user_dict.pop("password")
-    await create_user(user_dict)
-    return JSONResponse(
+    try:
+        await create_user(user_dict)
+    except DuplicateKeyError:
+        return FastJSONResponse(
+            status_code=status.HTTP_409_CONFLICT, content="User already exist"
+        )
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK, content="Succesful create new user"
     )
 
@@ -51,9 +74,10 @@ async def get_me(authorize: AuthJWT = Depends()):
     user_id = authorize.get_jwt_subject()
     user = await find_user_by_id(ObjectId(user_id))
     if user is None:
-        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=None)
+        return FastJSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=None)
 
-    return JSONResponse(status_code=status.HTTP_200_OK, content=to_json(user))
+    user.pop("hashed_password", None)
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content=user_json(user))
 
 
 @router.get("/")
@@ -63,25 +87,39 @@ async def get_all(
     authorize: AuthJWT = Depends(),
     skip=1,
     limit=10,
+    cursor: Union[str, None] = None,
+    fields: str = "",
 ):
     authorize.jwt_required()
+    projection = user_entity(
+        parse_fields(fields, USER_ENTITY_FIELDS, USER_HIDDEN_FIELDS)
+    )
 
-    query = {
-        "$or": [
+    query = {}
+    if name:
+        name = re.escape(name)
+        query["$or"] = [
             {"full_name": {"$regex": f"\\b{name}\\b", "$options": "i"}},
             {"full_name": {"$regex": name, "$options": "i"}},
             {"username": {"$regex": f"\\b{name}\\b", "$options": "i"}},
             {"username": {"$regex": name, "$options": "i"}},
         ]
-    }
 
     if role is not None:
         query["$and"] = [{"role": role}]
 
-    users = await get_users(query, int(skip), int(limit))
-    count = await count_users(query)
-    return JSONResponse(
-        status_code=status.HTTP_200_OK, content={"result": users, "total_record": count}
+    if cursor is not None:
+        page = get_users_after_cursor(query, cursor, int(limit), projection)
+    else:
+        page = get_users(query, int(skip), int(limit), projection)
+    users, count = await asyncio.gather(page, count_users(query))
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "result": users,
+            "total_record": count,
+            "next_cursor": next_cursor(users, int(limit)),
+        },
     )
 
 
@@ -97,24 +135,7 @@ async def update_me(
     if updated_user is None:
         return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
 
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
-
-
-@router.put("/{id}")
-async def update_by_id(id: str, user_data: UserUpdateModel = Body(...)):
-    user_data = {k: v for k, v in user_data.dict().items() if v is not None}
-    updated_user = await update_user(ObjectId(id), user_data)
-    if updated_user is None:
-        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content="Successful edit")
-
-
-@router.delete("/{id}")
-async def delete(id: str):
-    deleted = await delete_user(id)
-    if deleted is not True:
-        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
-    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
+    return FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
 
 
 @router.get("/cart")
@@ -123,22 +144,34 @@ async def get_cart(authorize: AuthJWT = Depends()):
     user_id = ObjectId(authorize.get_jwt_subject())
     user = await get_user(user_id)
     cart = []
-    if "cart" not in user:
-        return JSONResponse(
+    total = 0
+    if not user or not user.get("cart"):
+        return FastJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "cart": [],
+                "total": 0,
             },
         )
+    books = await find_books_by_ids(
+        (item["book_id"] for item in user["cart"]),
+        {"title": 1, "cover": 1, "price": 1},
+    )
     for item in user["cart"]:
-        book = await find_by_id(item["book_id"])
-        item["title"] = book["title"]
-        item["cover"] = book["cover"]
+        book = books.get(item["book_id"])
+        # Books removed from the catalog stay in the cart but are flagged
+        item["available"] = book is not None
+        item["title"] = book.get("title") if book else None
+        item["cover"] = book.get("cover") if book else None
+        item["price"] = book.get("price") if book else None
+        item["line_total"] = (item["price"] or 0) * item["booksnum"]
+        total += item["line_total"]
         cart.append(item)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "cart": cart,
+            "total": total,
         },
     )
 
@@ -149,33 +182,44 @@ async def add_cart(books: CartModel = Body(...), authorize: AuthJWT = Depends())
     user_id = ObjectId(authorize.get_jwt_subject())
 
     await add_to_cart(user_id, books)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_201_CREATED, content="Successful add to cart"
     )
 
 
+@router.put("/cart")
+async def change_cart(
+    changes: List[CartChangeModel] = Body(..., max_items=CART_MAX_CHANGES),
+    authorize: AuthJWT = Depends(),
+):
+    # One atomic update for the whole list, e.g. merging a guest cart on login
+    authorize.jwt_required()
+    user_id = ObjectId(authorize.get_jwt_subject())
+    cart = await apply_cart_changes(user_id, changes)
+    if cart is None:
+        return FastJSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=None)
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content={"cart": cart})
+
+
 @router.delete("/cart/{book_id}")
 async def delete_cart_items(book_id: str, authorize: AuthJWT = Depends()):
     authorize.jwt_required()
     user_id = ObjectId(authorize.get_jwt_subject())
-    user = await get_user(user_id)
-    for item in user["cart"]:
-        if item["book_id"] == book_id:
-            await delete_from_cart(user_id, book_id)
-    return JSONResponse(
+    await delete_from_cart(user_id, book_id)
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK,
         content="Succesful delete from cart",
     )
 
 
-@router.post("/avatar")
+@router.post("/avatar", dependencies=[Depends(check_upload_size)])
 async def upload_avatar(file: UploadFile = File(...), authorize: AuthJWT = Depends()):
     authorize.jwt_required()
     user_id = ObjectId(authorize.get_jwt_subject())
     try:
-        content = await file.read()
-        with open(f"static/avatar/{file.filename}", "wb") as f:
-            f.write(content)
+        avatar_url = await save_upload(file, "avatar")
+    except HTTPException:
+        raise
     except Exception as error:
         return HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -183,8 +227,32 @@ async def upload_avatar(file: UploadFile = File(...), authorize: AuthJWT = Depen
         )
     finally:
         await file.close()
-    await update_user(user_id, {"avatar_url": f"static/avatar/{file.filename}"})
-    return JSONResponse(
+    await update_user(user_id, {"avatar_url": avatar_url, "avatar_variants": {}})
+    queue_variants(
+        avatar_url,
+        lambda variants: set_avatar_variants(user_id, avatar_url, variants),
+    )
+    return FastJSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
-        content=f"static/avatar/{file.filename}",
+        content=static_url(avatar_url),
     )
+
+
+# Catch-all id routes last, so /cart and /me are matched first
+@router.put("/{id}")
+async def update_by_id(id: str, user_data: UserUpdateModel = Body(...)):
+    user_data = {k: v for k, v in user_data.dict().items() if v is not None}
+    updated_user = await update_user(ObjectId(id), user_data)
+    if updated_user is None:
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
+    return FastJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED, content="Successful edit"
+    )
+
+
+@router.delete("/{id}")
+async def delete(id: str):
+    deleted = await delete_user(id)
+    if deleted is not True:
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=None)
+    return FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=None)
@@ -1,17 +1,75 @@
+import copy
 import re
 from typing import List
 
 from bson.objectid import ObjectId
-from app.books.utils import to_json
-from app.user.models import CartModel
-from db.init_db import get_collection_client
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from app.books.utils import after_cursor, to_json
+from app.user.models import CartChangeModel, CartModel, CartOperation
+from core.cache import TTLCache, make_key
+from core.config import settings
+from core.metrics import register_cache
+from core.static import static_url, static_urls
+from db.init_db import get_collection_client, register_indexes
 
 client = get_collection_client("users")
+count_cache = TTLCache(settings.COUNT_CACHE_SIZE, settings.COUNT_CACHE_TTL)
+# Lean representation used by list views, the cart is only read by its owner
+USER_ENTITY_FIELDS = [
+    "_id",
+    "username",
+    "email",
+    "full_name",
+    "role",
+    "avatar_url",
+    "avatar_variants",
+]
+# Never returned by the API
+USER_HIDDEN_FIELDS = {"hashed_password"}
+
+# Holds both the raw document ("raw", id) and its JSON form ("json", id)
+user_cache = TTLCache(
+    settings.CACHE_SIZE if settings.CACHE_ENABLED else 0, settings.CACHE_TTL
+)
+register_cache("users_count", count_cache)
+register_cache("users", user_cache)
+
+
+def user_json(user) -> dict:
+    user = to_json(user)
+    if user.get("avatar_url"):
+        user["avatar_url"] = static_url(user["avatar_url"])
+    if user.get("avatar_variants"):
+        user["avatar_variants"] = static_urls(user["avatar_variants"])
+    return user
+
+
+register_indexes(
+    "users",
+    [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+        IndexModel([("cart.book_id", ASCENDING)], name="cart_book_id"),
+    ],
+)
+
+
+def invalidate_user(user_id):
+    user_cache.pop(("raw", str(user_id)))
+    user_cache.pop(("json", str(user_id)))
 
 
 async def create_user(user):
-    created_user = await client.insert_one(user)
-    return await client.find_one({"id": created_user.inserted_id})
+    await client.insert_one(user)
+    count_cache.clear()
+    return user
+
+
+async def bulk_write_users(requests: list):
+    try:
+        return await client.bulk_write(requests, ordered=False)
+    finally:
+        count_cache.clear()
+        user_cache.clear()
 
 
 async def read_user_by_username(username: str):
@@ -19,77 +77,163 @@ async def read_user_by_username(username: str):
 
 
 async def update_user(user_id: ObjectId, user):
-    return await client.update_one({"_id": user_id}, {"$set": user})
+    result = await client.update_one({"_id": user_id}, {"$set": user})
+    invalidate_user(user_id)
+    return result
+
+
+async def set_avatar_variants(user_id: ObjectId, avatar_url: str, variants: dict):
+    # Skip if the avatar was replaced while its variants were being built
+    await client.update_one(
+        {"_id": user_id, "avatar_url": avatar_url},
+        {"$set": {"avatar_variants": variants}},
+    )
+    invalidate_user(user_id)
 
 
 async def delete_user(user_id: str):
     user = await client.delete_one({"_id": ObjectId(user_id)})
-    if user:
-        await client.delete_one({"_id": ObjectId(user_id)})
+    count_cache.clear()
+    invalidate_user(user_id)
+    if user.deleted_count > 0:
         return True
 
 
-async def get_users(filter_spec, skip: int, limit: int):
+async def get_users(filter_spec, skip: int, limit: int, projection=None):
     offset = (skip - 1) * limit if skip > 0 else 0
     users = []
-    async for new in client.find(filter_spec).sort("_id").skip(offset).limit(limit):
-        new = to_json(new)
+    async for new in (
+        client.find(filter_spec, projection).sort("_id").skip(offset).limit(limit)
+    ):
+        new = user_json(new)
+        users.append(new)
+
+    return users
+
+
+async def iter_users(filter_spec, projection=None, batch_size: int = 500):
+    """Yield matching users one by one straight from the cursor."""
+    cursor = client.find(filter_spec, projection).sort("_id").batch_size(batch_size)
+    async for user in cursor:
+        yield user_json(user)
+
+
+async def get_users_after_cursor(filter_spec, cursor: str, limit: int, projection=None):
+    if cursor:
+        filter_spec = after_cursor(filter_spec, cursor)
+    users = []
+    async for new in client.find(filter_spec, projection).sort("_id").limit(limit):
+        new = user_json(new)
         users.append(new)
 
     return users
 
 
 async def count_users(filter_spec):
-    return await client.count_documents(filter_spec)
+    if not filter_spec and settings.COUNT_ESTIMATE_UNFILTERED:
+        return await client.estimated_document_count()
+    key = make_key(filter_spec)
+    count = count_cache.get(key)
+    if count is None:
+        count = await client.count_documents(filter_spec)
+        count_cache.set(key, count)
+    return count
 
 
 async def get_user_by_id(id: ObjectId):
-    return await client.find_one({"_id": id})
+    user = user_cache.get(("raw", str(id)))
+    if user is None:
+        user = await client.find_one({"_id": ObjectId(id)})
+        if not user:
+            return None
+        user_cache.set(("raw", str(id)), user)
+    return copy.deepcopy(user)
 
 
 async def get_user(id: str) -> dict:
-    user_detail = await client.find_one({"_id": ObjectId(id)})
-    if user_detail:
-        user = to_json(user_detail)
-        return user
+    user = user_cache.get(("json", str(id)))
+    if user is None:
+        user_detail = await get_user_by_id(id)
+        if not user_detail:
+            return None
+        user = user_json(user_detail)
+        user_cache.set(("json", str(id)), user)
+    return copy.deepcopy(user)
+
+
+async def get_usernames(ids) -> dict:
+    user_ids = list({ObjectId(id) for id in ids if ObjectId.is_valid(id)})
+    usernames = {}
+    if not user_ids:
+        return usernames
+    async for user in client.find({"_id": {"$in": user_ids}}, {"username": 1}):
+        usernames[str(user["_id"])] = user["username"]
+    return usernames
 
 
 async def find_user_by_id(user_id: str):
-    return await client.find_one({"_id": user_id})
+    return await get_user_by_id(user_id)
 
 
-async def add_to_cart(id: ObjectId, data: CartModel):
-    existing_item = await client.find_one(
-        {"_id": id, "cart.book_id": data.book_id},
-        projection={"cart.$": 1},
-    )
-    if existing_item:
-        existing_booksnum = existing_item["cart"][0]["booksnum"]
-        data.booksnum == existing_booksnum
-        await client.update_one(
-            {
-                "_id": id,
-                "cart.book_id": data.book_id,
-            },
-            {
-                "$set": {
-                    "cart.$.booksnum": data.booksnum,
-                }
-            },
-        )
+def cart_stage(change: CartChangeModel) -> dict:
+    """Pipeline stage applying one cart change to the user's cart."""
+    cart = {"$ifNull": ["$cart", []]}
+    if change.op == CartOperation.remove:
+        kept = {"$ne": ["$$this.book_id", change.book_id]}
+        return {"$set": {"cart": {"$filter": {"input": cart, "cond": kept}}}}
+    if change.op == CartOperation.increment:
+        booksnum = {"$add": ["$$this.booksnum", change.booksnum]}
     else:
-        await client.update_one(
-            {"_id": id},
-            {
-                "$push": {
-                    "cart": data.dict(),
-                }
+        booksnum = change.booksnum
+    in_cart = {"$in": [change.book_id, {"$ifNull": ["$cart.book_id", []]}]}
+    updated = {
+        "$map": {
+            "input": cart,
+            "in": {
+                "$cond": [
+                    {"$eq": ["$$this.book_id", change.book_id]},
+                    {"$mergeObjects": ["$$this", {"booksnum": booksnum}]},
+                    "$$this",
+                ]
             },
-        )
+        }
+    }
+    item = {"book_id": change.book_id, "booksnum": change.booksnum}
+    appended = {"$concatArrays": [cart, [{"$literal": item}]]}
+    return {"$set": {"cart": {"$cond": [in_cart, updated, appended]}}}
+
+
+async def apply_cart_changes(user_id: ObjectId, changes: list[CartChangeModel]):
+    """Apply every change in order in one atomic update, return the new cart."""
+    pipeline = [cart_stage(change) for change in changes]
+    # Items brought to zero (or below) leave the cart
+    positive = {"$gt": ["$$this.booksnum", 0]}
+    pipeline.append(
+        {
+            "$set": {
+                "cart": {
+                    "$filter": {"input": {"$ifNull": ["$cart", []]}, "cond": positive}
+                }
+            }
+        }
+    )
+    user = await client.find_one_and_update(
+        {"_id": user_id},
+        pipeline,
+        projection={"cart": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    invalidate_user(user_id)
+    return user["cart"] if user else None
+
+
+async def add_to_cart(id: ObjectId, data: CartModel):
+    change = CartChangeModel(book_id=data.book_id, booksnum=data.booksnum)
+    return await apply_cart_changes(id, [change])
 
 
 async def delete_from_cart(user_id: ObjectId, book_id: str):
-    return await client.update_one(
+    result = await client.update_one(
         {"_id": user_id},
         {
             "$pull": {
@@ -97,21 +241,10 @@ async def delete_from_cart(user_id: ObjectId, book_id: str):
             },
         },
     )
+    invalidate_user(user_id)
+    return result
 
 
-def user_entity(user) -> dict:
-    cart = []
-    if "cart" in user:
-        for books_id in user["cart"]:
-            cart.append(str(books_id))
-
-    return {
-        "_id": str(user["_id"]),
-        "email": user["email"],
-        "username": user["username"],
-        "full_name": user["full_name"],
-        "role": user["role"],
-        "hashed_password": user["hashed_password"],
-        "avatar_url": user["avatar_url"] if "avatar_url" in user else None,
-        "cart": cart if "cart" in user else None,
-    }
+def user_entity(fields: list[str] | None = None) -> dict:
+    """Projection of the user representation, the lean list view by default."""
+    return {field: 1 for field in fields or USER_ENTITY_FIELDS}
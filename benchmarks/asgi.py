@@ -0,0 +1,90 @@
+"""
+    Minimal in-process HTTP client for driving an ASGI app without a server
+    or a socket, so benchmarks time the app and nothing else.
+"""
+import asyncio
+from urllib.parse import urlsplit
+
+import orjson
+
+
+class Response:
+    def __init__(self, status: int, headers: list, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name: bytes) -> bytes | None:
+        return next((value for key, value in self.headers if key == name), None)
+
+    def cookies(self) -> dict[str, str]:
+        cookies = {}
+        for key, value in self.headers:
+            if key == b"set-cookie":
+                pair = value.decode("latin-1").split(";", 1)[0]
+                name, _, cookie = pair.partition("=")
+                cookies[name.strip()] = cookie.strip()
+        return cookies
+
+    def json(self):
+        return orjson.loads(self.body)
+
+
+async def request(
+    app,
+    method: str,
+    url: str,
+    json=None,
+    headers: dict | None = None,
+    cookies: dict | None = None,
+) -> Response:
+    parts = urlsplit(url)
+    body = orjson.dumps(json) if json is not None else b""
+    raw_headers = [(b"host", b"benchmark")]
+    if json is not None:
+        raw_headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+    if cookies:
+        cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        raw_headers.append((b"cookie", cookie.encode("latin-1")))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), value.encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "root_path": "",
+        "query_string": parts.query.encode(),
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    sent = False
+    status = 500
+    response_headers = []
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # The client stays connected, streaming responses must not stop
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return Response(status, response_headers, b"".join(chunks))
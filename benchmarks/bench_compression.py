@@ -0,0 +1,42 @@
+"""
+    CPU cost vs bytes saved when compressing list pages.
+
+    python -m benchmarks.bench_compression
+"""
+import timeit
+
+import orjson
+
+from app.books.utils import to_json
+from benchmarks.fixtures import make_book
+from core.compression import Compressor
+
+ROUNDS = 50
+LEVELS = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 11)]
+
+
+def compress(encoding: str, level: int, body: bytes) -> bytes:
+    compressor = Compressor(encoding, gzip_level=level, brotli_quality=level)
+    return compressor.compress(body) + compressor.flush()
+
+
+def main():
+    for page_size in (10, 50):
+        books = [to_json(make_book(i)) for i in range(page_size)]
+        body = orjson.dumps({"result": books, "total_record": len(books)})
+        print(f"{page_size}-book page, {len(body)} bytes")
+        for encoding, level in LEVELS:
+            rounds = 5 if (encoding, level) == ("br", 11) else ROUNDS
+            timings = timeit.repeat(
+                lambda: compress(encoding, level, body), number=rounds, repeat=3
+            )
+            seconds = min(timings) / rounds
+            size = len(compress(encoding, level, body))
+            print(
+                f"  {encoding:<4} {level:>2}  {size:>7} bytes ({size / len(body):5.1%})"
+                f"  {seconds * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+    Auth overhead per request: RS512 (4096-bit) vs ES256, with and without
+    the verified-token cache.
+
+    python -m benchmarks.bench_jwt
+"""
+import timeit
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi_jwt_auth import AuthJWT as BaseAuthJWT
+from pydantic import BaseModel
+
+from app.auth.jwt import AuthJWT, verified_tokens
+
+ROUNDS = 200
+
+
+def pem_keys(private_key) -> tuple[str, str]:
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def configure(algorithm: str, private_key: str, public_key: str):
+    class Config(BaseModel):
+        authjwt_algorithm: str = algorithm
+        authjwt_private_key: str = private_key
+        authjwt_public_key: str = public_key
+
+    BaseAuthJWT.load_config(lambda: Config())
+
+
+def per_request_us(auth) -> float:
+    token = auth.create_access_token(subject="64a000000000000000000000")
+
+    # jwt_required() + get_jwt_subject() both decode the token
+    def request():
+        auth._verified_token(token)
+        auth._verified_token(token)
+
+    return min(timeit.repeat(request, number=ROUNDS, repeat=3)) / ROUNDS * 1e6
+
+
+def main():
+    keys = {
+        "RS512": rsa.generate_private_key(public_exponent=65537, key_size=4096),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+    }
+    for algorithm, private_key in keys.items():
+        configure(algorithm, *pem_keys(private_key))
+        verified_tokens.clear()
+        plain = per_request_us(BaseAuthJWT())
+        cached = per_request_us(AuthJWT())
+        print(
+            f"{algorithm}  uncached {plain:9.1f} us/request  cached {cached:7.1f} us/request"
+        )
+
+
+if __name__ == "__main__":
+    main()
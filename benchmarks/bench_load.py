@@ -0,0 +1,465 @@
+"""
+    End-to-end load test of main.app, in-process over ASGI.
+
+    Seeds a synthetic catalog (books, users with carts, ratings) into a local
+    mongod when one is on the PATH, or into the in-memory fake otherwise, then
+    runs a weighted mix of browse/search/detail/rate/cart/login requests and
+    reports latency percentiles and throughput per route.
+
+    python -m benchmarks.bench_load --books 10000 --mix shop
+    python -m benchmarks.bench_load --backend fake --books 100000 --requests 20000
+    python -m benchmarks.bench_load --compare before.json after.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from bson import ObjectId
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from pymongo import MongoClient
+
+from benchmarks.asgi import request
+from benchmarks.bench_jwt import pem_keys
+from benchmarks.fixtures import CATEGORIES, WORDS, make_book, sentence
+from core.config import settings
+from db import init_db
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PASSWORD = "benchmark-password"
+
+# Weights of each scenario in a traffic mix
+MIXES = {
+    "browse": {"browse": 50, "detail": 35, "search": 15},
+    "shop": {
+        "browse": 25,
+        "search": 10,
+        "detail": 25,
+        "cart_view": 15,
+        "cart_change": 10,
+        "rate": 10,
+        "login": 5,
+    },
+    "write": {"rate": 50, "cart_change": 50},
+    "login": {"login": 100},
+}
+
+
+class Catalog:
+    """Ids of the seeded data, and the sessions requests are sent with."""
+
+    def __init__(self, book_ids: list, usernames: list):
+        self.book_ids = book_ids
+        self.usernames = usernames
+        self.sessions: list[dict] = []
+
+
+# Each scenario returns (route, method, url, json body, needs a session)
+def browse(catalog: Catalog, rng: random.Random):
+    page = rng.randint(1, 20)
+    if rng.random() < 0.3:
+        category = rng.choice(CATEGORIES)
+        return (
+            "GET /books/?category",
+            "GET",
+            f"/books/?category={category}&skip={page}&limit=20",
+            None,
+            False,
+        )
+    return "GET /books/", "GET", f"/books/?skip={page}&limit=20", None, False
+
+
+def search(catalog: Catalog, rng: random.Random):
+    return (
+        "GET /books/?search",
+        "GET",
+        f"/books/?search={rng.choice(WORDS)}&limit=20",
+        None,
+        False,
+    )
+
+
+def detail(catalog: Catalog, rng: random.Random):
+    # A few books get most of the views
+    book_id = catalog.book_ids[int(rng.paretovariate(1.2)) % len(catalog.book_ids)]
+    return "GET /books/{id}", "GET", f"/books/{book_id}", None, False
+
+
+def rate(catalog: Catalog, rng: random.Random):
+    book_id = rng.choice(catalog.book_ids)
+    body = {"rate": rng.randint(1, 5), "comment": sentence(8, rng)}
+    return "PUT /books/rate/{id}", "PUT", f"/books/rate/{book_id}", body, True
+
+
+def cart_view(catalog: Catalog, rng: random.Random):
+    return "GET /user/cart", "GET", "/user/cart", None, True
+
+
+def cart_change(catalog: Catalog, rng: random.Random):
+    body = [
+        {"book_id": str(rng.choice(catalog.book_ids)), "booksnum": rng.randint(1, 2)}
+        for _ in range(rng.randint(1, 3))
+    ]
+    return "PUT /user/cart", "PUT", "/user/cart", body, True
+
+
+def login(catalog: Catalog, rng: random.Random):
+    body = {"username": rng.choice(catalog.usernames), "password": PASSWORD}
+    return "POST /login", "POST", "/login", body, False
+
+
+SCENARIOS = {
+    "browse": browse,
+    "search": search,
+    "detail": detail,
+    "rate": rate,
+    "cart_view": cart_view,
+    "cart_change": cart_change,
+    "login": login,
+}
+
+
+def signing_keys(algorithm: str) -> tuple[str, str]:
+    """Throwaway key pair, so the benchmark never needs the deployment's keys."""
+    curves = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+    if algorithm in curves:
+        return pem_keys(ec.generate_private_key(curves[algorithm]()))
+    return pem_keys(rsa.generate_private_key(public_exponent=65537, key_size=4096))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MongodBackend:
+    """A throwaway mongod on a free port with its data in a temp directory."""
+
+    name = "mongod"
+
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix="bench-mongod-")
+        port = free_port()
+        self.process = subprocess.Popen(
+            [
+                shutil.which("mongod"),
+                "--dbpath",
+                self.path,
+                "--port",
+                str(port),
+                "--bind_ip",
+                "127.0.0.1",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        settings.MONGO_DETAILS = f"mongodb://127.0.0.1:{port}"
+        with MongoClient(
+            settings.MONGO_DETAILS, serverSelectionTimeoutMS=30000
+        ) as client:
+            client.admin.command("ping")
+            self.version = client.server_info()["version"]
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class FakeBackend:
+    """The in-memory fake, swapped in for the Motor client."""
+
+    name = "fake"
+    version = None
+
+    def __enter__(self):
+        from benchmarks.fake_mongo import FakeMongoClient
+
+        self.create_client = init_db.create_client
+        init_db.create_client = FakeMongoClient
+        return self
+
+    def __exit__(self, *exc):
+        init_db.create_client = self.create_client
+
+
+def make_backend(name: str):
+    if name == "auto":
+        name = "mongod" if shutil.which("mongod") else "fake"
+    if name == "mongod" and not shutil.which("mongod"):
+        sys.exit("mongod is not on the PATH, use --backend fake")
+    return MongodBackend() if name == "mongod" else FakeBackend()
+
+
+async def seed(args, rng: random.Random) -> Catalog:
+    from app.auth.password import async_get_password_hash
+    from app.books.services import client as books, prepare_book
+    from app.user.services import client as users
+
+    # One hash shared by every user, hashing 100k passwords is not the point
+    hashed_password = await async_get_password_hash(PASSWORD)
+    user_ids = [ObjectId() for _ in range(args.users)]
+    usernames = [f"reader{index}" for index in range(args.users)]
+    batch = []
+    for index, user_id in enumerate(user_ids):
+        batch.append(
+            {
+                "_id": user_id,
+                "username": usernames[index],
+                "email": f"{usernames[index]}@example.com",
+                "full_name": f"Reader {index}",
+                "role": "user",
+                "hashed_password": hashed_password,
+                "cart": [],
+            }
+        )
+        if len(batch) >= 10000:
+            await users.insert_many(batch)
+            batch = []
+    if batch:
+        await users.insert_many(batch)
+
+    book_ids = []
+    batch = []
+    for index in range(args.books):
+        ratings = rng.randint(0, args.max_ratings)
+        book = make_book(index, rng, ratings, user_ids)
+        book_ids.append(book["_id"])
+        batch.append(prepare_book(book))
+        if len(batch) >= 10000:
+            await books.insert_many(batch)
+            batch = []
+    if batch:
+        await books.insert_many(batch)
+
+    # Some users already have something in their cart
+    for user_id in user_ids[: args.users // 2]:
+        cart = [
+            {"book_id": str(rng.choice(book_ids)), "booksnum": rng.randint(1, 3)}
+            for _ in range(rng.randint(1, 4))
+        ]
+        await users.update_one({"_id": user_id}, {"$set": {"cart": cart}})
+    return Catalog([str(book_id) for book_id in book_ids], usernames)
+
+
+async def open_sessions(app, catalog: Catalog, count: int, rng: random.Random):
+    for username in rng.sample(catalog.usernames, min(count, len(catalog.usernames))):
+        response = await request(
+            app, "POST", "/login", json={"username": username, "password": PASSWORD}
+        )
+        if response.status != 200:
+            sys.exit(
+                f"Cannot log in as {username}: {response.status} {response.body!r}"
+            )
+        catalog.sessions.append(response.cookies())
+
+
+async def drive(
+    app, catalog: Catalog, mix: dict, count: int, concurrency: int, rng: random.Random
+):
+    names = list(mix)
+    weights = list(mix.values())
+    planned = [
+        SCENARIOS[name](catalog, rng) for name in rng.choices(names, weights, k=count)
+    ]
+    sessions = [rng.choice(catalog.sessions) for _ in planned]
+    timings: dict[str, list[float]] = {}
+    statuses: dict[str, Counter] = {}
+    pending = iter(range(count))
+
+    async def worker():
+        for index in pending:
+            route, method, url, body, needs_session = planned[index]
+            cookies = sessions[index] if needs_session else None
+            started = time.perf_counter()
+            try:
+                response = await request(app, method, url, json=body, cookies=cookies)
+                status = response.status
+            except Exception as error:
+                status = type(error).__name__
+            timings.setdefault(route, []).append(time.perf_counter() - started)
+            statuses.setdefault(route, Counter())[str(status)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, statuses, time.perf_counter() - started
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(timings: list[float], statuses: Counter, elapsed: float) -> dict:
+    ordered = sorted(timings)
+    errors = sum(
+        count for status, count in statuses.items() if not status.startswith(("2", "3"))
+    )
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "status": dict(statuses),
+        "rps": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: dict):
+    meta = results["meta"]
+    print(
+        f"{meta['backend']} backend, {meta['books']} books, {meta['users']} users, "
+        f"mix {meta['mix']}, {meta['requests']} requests, concurrency {meta['concurrency']}"
+    )
+    print(
+        f"  {'route':<24} {'count':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for route, stats in [*results["routes"].items(), ("total", results["total"])]:
+        print(
+            f"  {route:<24} {stats['count']:>6} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+
+
+def compare(before_path: str, after_path: str):
+    before = orjson.loads(Path(before_path).read_bytes())
+    after = orjson.loads(Path(after_path).read_bytes())
+    print(
+        f"{before_path} ({before['meta'].get('commit')}) -> {after_path} ({after['meta'].get('commit')})"
+    )
+    for key in ("backend", "books", "users", "mix", "concurrency"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(
+                f"  warning: {key} differs, {before['meta'].get(key)} vs {after['meta'].get(key)}"
+            )
+    print(f"  {'route':<24} {'rps':>16} {'p50':>16} {'p95':>16} {'p99':>16}")
+    routes = [*dict.fromkeys([*before["routes"], *after["routes"]]), "total"]
+    for route in routes:
+        old = before["total"] if route == "total" else before["routes"].get(route)
+        new = after["total"] if route == "total" else after["routes"].get(route)
+        if old is None or new is None:
+            print(f"  {route:<24} only in {'after' if old is None else 'before'}")
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (new[key] - old[key]) / old[key] if old[key] else 0
+            cells.append(f"{new[key]:>8.2f} {change:>+7.1%}")
+        print(f"  {route:<24} {' '.join(cells)}")
+
+
+async def run(args) -> dict:
+    import main
+
+    rng = random.Random(args.seed)
+    await main.app.router.startup()
+    try:
+        started = time.perf_counter()
+        catalog = await seed(args, rng)
+        seeded = time.perf_counter() - started
+        print(f"Seeded {args.books} books and {args.users} users in {seeded:.1f}s")
+        await open_sessions(main.app, catalog, args.sessions, rng)
+        mix = MIXES[args.mix]
+        if args.warmup:
+            await drive(main.app, catalog, mix, args.warmup, args.concurrency, rng)
+        timings, statuses, elapsed = await drive(
+            main.app, catalog, mix, args.requests, args.concurrency, rng
+        )
+    finally:
+        await main.app.router.shutdown()
+    every_timing = [timing for route in timings.values() for timing in route]
+    every_status = sum(statuses.values(), Counter())
+    return {
+        "routes": {
+            route: summarize(timings[route], statuses[route], elapsed)
+            for route in sorted(timings)
+        },
+        "total": summarize(every_timing, every_status, elapsed),
+        "elapsed_s": round(elapsed, 3),
+        "seed_s": round(seeded, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--backend", choices=["auto", "mongod", "fake"], default="auto")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--max-ratings", type=int, default=5)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="shop")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--output", help="result file, default benchmarks/results/<time>-<mix>.json"
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # A fresh database every run, and no request log in the measurements
+    settings.DATABASE_NAME = f"bench_{os.getpid()}"
+    settings.LOG_ACCESS = False
+    settings.PRIVATE_KEY, settings.PUBLIC_KEY = signing_keys(settings.JWT_ALGORITHM)
+    with make_backend(args.backend) as backend:
+        results = asyncio.run(run(args))
+    results["meta"] = {
+        "backend": backend.name,
+        "mongod_version": backend.version,
+        "books": args.books,
+        "users": args.users,
+        "mix": args.mix,
+        "weights": MIXES[args.mix],
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+    print_table(results)
+
+    output = (
+        Path(args.output)
+        if args.output
+        else RESULTS_DIR
+        / (f"{datetime.now():%Y%m%d-%H%M%S}-{args.mix}-{args.books}.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
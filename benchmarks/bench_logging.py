@@ -0,0 +1,88 @@
+"""
+    Request latency with logging off, written inline (the old StreamHandler)
+    and through the queue, against a stderr consumer that is slow to drain.
+
+    python -m benchmarks.bench_logging
+"""
+import asyncio
+import io
+import logging
+import statistics
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.asgi import request
+from core import logging as api_logging
+from core.config import settings
+from core.logging import RequestIdFilter, RequestLogMiddleware, logger
+
+REQUESTS = 2000
+# A terminal or log shipper that falls behind blocks every write for a while
+WRITE_DELAY = 0.0002
+
+
+class SlowStream(io.StringIO):
+    def write(self, text: str) -> int:
+        time.sleep(WRITE_DELAY)
+        return super().write(text)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/books/{book_id}")
+    async def get_book(book_id: str):
+        logger.debug(f"Loading book {book_id}")
+        return {"_id": book_id, "title": "Book"}
+
+    app.add_middleware(RequestLogMiddleware, access_log=True)
+    return app
+
+
+async def run(app) -> list[float]:
+    timings = []
+    for i in range(REQUESTS):
+        started = time.perf_counter()
+        await request(app, "GET", f"/books/{i}")
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"  {name:<8} p50 {p50:8.1f} us  p99 {p99:8.1f} us")
+
+
+def main():
+    app = make_app()
+    print(f"{REQUESTS} requests, 2 records each, {WRITE_DELAY * 1e6:.0f} us per write")
+
+    api_logging.stop_logging()
+    logger.handlers.clear()
+    logger.disabled = True
+    report("off", asyncio.run(run(app)))
+    logger.disabled = False
+
+    inline = logging.StreamHandler(SlowStream())
+    inline.setFormatter(api_logging.create_formatter())
+    inline.addFilter(RequestIdFilter())
+    logger.addHandler(inline)
+    logger.setLevel(logging.DEBUG)
+    report("inline", asyncio.run(run(app)))
+    logger.removeHandler(inline)
+
+    # Same records in both runs, the rate limit would drop most of them
+    settings.LOG_RATE_LIMIT = 0
+    api_logging.setup_logging(SlowStream())
+    logger.setLevel(logging.DEBUG)
+    report("queue", asyncio.run(run(app)))
+    api_logging.stop_logging()
+    dropped = logger.handlers[0].dropped
+    print(f"  queue dropped {dropped} records while the stream was behind")
+
+
+if __name__ == "__main__":
+    main()
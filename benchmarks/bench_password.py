@@ -0,0 +1,62 @@
+"""
+    Event loop latency while concurrent logins verify bcrypt hashes.
+
+    python -m benchmarks.bench_password [concurrent_logins]
+"""
+import asyncio
+import sys
+import time
+
+from app.auth.password import (
+    async_verify_and_update,
+    get_password_hash,
+    shutdown_executor,
+    verify_and_update,
+)
+
+TICK = 0.005
+
+
+async def inline_login(hashed: str):
+    verify_and_update("secret", hashed)
+
+
+async def pooled_login(hashed: str):
+    await async_verify_and_update("secret", hashed)
+
+
+async def measure(login, hashed: str, concurrent: int) -> tuple[float, float, float]:
+    """Run ``concurrent`` logins while a ticker records how late the loop wakes it."""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(login(hashed) for _ in range(concurrent)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await task
+    lags.sort()
+    return elapsed, lags[len(lags) // 2] * 1000, lags[-1] * 1000
+
+
+async def main(concurrent: int):
+    hashed = get_password_hash("secret")
+    print(f"{concurrent} concurrent logins")
+    for name, login in (("inline", inline_login), ("pool", pooled_login)):
+        elapsed, p50, worst = await measure(login, hashed, concurrent)
+        print(
+            f"{name:<7} total {elapsed:6.2f}s  loop lag p50 {p50:8.2f} ms  max {worst:8.2f} ms"
+        )
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
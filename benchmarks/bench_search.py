@@ -0,0 +1,72 @@
+"""
+    Regex filters vs the weighted text index on a synthetic catalog.
+
+    Needs a running MongoDB (MONGO_DETAILS). Seeds a throwaway database.
+
+    python -m benchmarks.bench_search [number_of_books]
+"""
+import asyncio
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.books.services import SEARCH_WEIGHTS, prepare_book
+from app.books.utils import normalize_search
+from benchmarks.fixtures import make_book
+from core.config import settings
+
+DATABASE = "books_bench"
+TERMS = ["mat biec", "Nguyễn", "tuoi tho", "kinh te"]
+ROUNDS = 20
+
+
+async def seed(collection, total: int):
+    await collection.drop()
+    for start in range(0, total, 10000):
+        await collection.insert_many(
+            [
+                prepare_book(make_book(i, ratings=0))
+                for i in range(start, min(start + 10000, total))
+            ]
+        )
+    await collection.create_index(
+        [(f"search.{field}", "text") for field in SEARCH_WEIGHTS],
+        weights={f"search.{field}": weight for field, weight in SEARCH_WEIGHTS.items()},
+        default_language="none",
+    )
+
+
+async def timed(make_cursor) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await make_cursor().to_list(10)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+async def main(total: int):
+    client = AsyncIOMotorClient(settings.MONGO_DETAILS)
+    collection = client[DATABASE]["books"]
+    await seed(collection, total)
+    score = {"$meta": "textScore"}
+    print(f"{total} books, mean ms per first page")
+    for term in TERMS:
+        regex = {
+            "$or": [
+                {field: {"$regex": term, "$options": "i"}} for field in SEARCH_WEIGHTS
+            ]
+        }
+        text = {"$text": {"$search": normalize_search(term)}}
+        regex_ms = await timed(lambda: collection.find(regex).sort("_id").limit(10))
+        text_ms = await timed(
+            lambda: collection.find(text, {"score": score})
+            .sort([("score", score)])
+            .limit(10)
+        )
+        print(f"{term!r:<14} regex {regex_ms:8.2f}  text {text_ms:8.2f}")
+    await client.drop_database(DATABASE)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
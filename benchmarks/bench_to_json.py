@@ -0,0 +1,41 @@
+"""
+    Per-document serialisation cost of a 50-row books page.
+
+    python -m benchmarks.bench_to_json
+"""
+import json
+import timeit
+
+from app.books.utils import CustomJSONEncoder, FastJSONResponse, to_json
+from benchmarks.fixtures import make_book
+
+PAGE_SIZE = 50
+ROUNDS = 200
+
+
+def legacy_page(page):
+    def legacy_to_json(doc):
+        return json.loads(json.dumps(doc, cls=CustomJSONEncoder, default=str))
+
+    content = {"result": [legacy_to_json(doc) for doc in page], "total_record": 1}
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+
+def fast_page(page):
+    content = {"result": [to_json(doc) for doc in page], "total_record": 1}
+    return FastJSONResponse(content=content).body
+
+
+def main():
+    page = [make_book(i) for i in range(PAGE_SIZE)]
+    for name, func in (
+        ("dumps/loads + json", legacy_page),
+        ("to_json + orjson", fast_page),
+    ):
+        seconds = min(timeit.repeat(lambda: func(page), number=ROUNDS, repeat=5))
+        per_doc = seconds / ROUNDS / PAGE_SIZE * 1e6
+        print(f"{name:<20} {per_doc:8.2f} us/doc")
+
+
+if __name__ == "__main__":
+    main()
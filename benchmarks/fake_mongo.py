@@ -0,0 +1,785 @@
+"""
+    In-memory stand-in for the Motor client, covering the part of the query
+    language the API itself sends: filters, projections, sorts, $text search,
+    update operators and the pipeline updates of the cart and ratings.
+
+    Every query is a scan of a dict, so numbers measured against it are the
+    cost of the API, not of Mongo's query planner.
+"""
+import asyncio
+import copy
+import re
+from itertools import islice
+
+from bson import ObjectId, Regex
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+MISSING = object()
+WORD = re.compile(r"\w+")
+
+
+def type_rank(value) -> int:
+    # BSON comparison order between types
+    if value is None or value is MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    return 7
+
+
+def sort_key(value):
+    if value is MISSING:
+        value = None
+    return (type_rank(value), value if value is not None else 0)
+
+
+def compare(left, right) -> int | None:
+    """-1, 0 or 1, None when the values are of different BSON types."""
+    if type_rank(left) != type_rank(right):
+        return None
+    if left is None or left is MISSING:
+        return 0
+    try:
+        return (left > right) - (left < right)
+    except TypeError:
+        return None
+
+
+def resolve(doc, path: str) -> list:
+    """Every value found at ``path``, arrays on the way are traversed."""
+    values = [doc]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                else:
+                    found.extend(
+                        item[part]
+                        for item in value
+                        if isinstance(item, dict) and part in item
+                    )
+        values = found
+    return values
+
+
+def candidates(doc, path: str) -> list:
+    """Values a query condition is tested against, including array elements."""
+    values = []
+    for value in resolve(doc, path):
+        values.append(value)
+        if isinstance(value, list):
+            values.extend(value)
+    return values
+
+
+def compile_regex(pattern, options: str = ""):
+    if isinstance(pattern, Regex):
+        pattern = pattern.try_compile()
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (("i", re.I), ("m", re.M), ("s", re.S), ("x", re.X)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+def match_operator(values: list, operator: str, argument, condition: dict) -> bool:
+    if operator == "$eq":
+        return any(compare(value, argument) == 0 for value in values) or (
+            argument is None and not values
+        )
+    if operator == "$ne":
+        return not match_operator(values, "$eq", argument, condition)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        accepted = {"$gt": (1,), "$gte": (0, 1), "$lt": (-1,), "$lte": (-1, 0)}
+        return any(compare(value, argument) in accepted[operator] for value in values)
+    if operator == "$in":
+        return any(match_value(values, item) for item in argument)
+    if operator == "$nin":
+        return not any(match_value(values, item) for item in argument)
+    if operator == "$exists":
+        return bool(values) == bool(argument)
+    if operator == "$regex":
+        regex = compile_regex(argument, condition.get("$options", ""))
+        return any(isinstance(value, str) and regex.search(value) for value in values)
+    if operator == "$options":
+        return True
+    if operator == "$size":
+        return any(
+            isinstance(value, list) and len(value) == argument for value in values
+        )
+    if operator == "$elemMatch":
+        return any(
+            isinstance(value, dict) and matches(value, argument) for value in values
+        )
+    if operator == "$not":
+        return not match_condition(values, argument)
+    raise OperationFailure(f"Unsupported query operator {operator}")
+
+
+def match_value(values: list, expected) -> bool:
+    if isinstance(expected, (re.Pattern, Regex)):
+        regex = compile_regex(expected)
+        return any(isinstance(value, str) and regex.search(value) for value in values)
+    return any(compare(value, expected) == 0 for value in values) or (
+        expected is None and not values
+    )
+
+
+def match_condition(values: list, condition) -> bool:
+    if (
+        isinstance(condition, dict)
+        and condition
+        and next(iter(condition)).startswith("$")
+    ):
+        return all(
+            match_operator(values, operator, argument, condition)
+            for operator, argument in condition.items()
+        )
+    return match_value(values, condition)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, part) for part in condition):
+                return False
+        elif key == "$text":
+            continue
+        elif not match_condition(candidates(doc, key), condition):
+            return False
+    return True
+
+
+def set_path(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def get_path(doc, path: str):
+    for part in path.split("."):
+        if isinstance(doc, dict):
+            doc = doc.get(part, MISSING)
+        elif isinstance(doc, list):
+            doc = [item.get(part, MISSING) for item in doc if isinstance(item, dict)]
+            doc = [item for item in doc if item is not MISSING]
+        else:
+            return MISSING
+    return doc
+
+
+def evaluate(expression, doc: dict, variables: dict):
+    """Aggregation expression evaluation, as used by pipeline updates."""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        value = variables.get(name, MISSING) if name != "ROOT" else doc
+        return get_path(value, path) if path else value
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_path(doc, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) == 1 and next(iter(expression)).startswith("$"):
+        operator, argument = next(iter(expression.items()))
+        return apply_expression(operator, argument, doc, variables)
+    return {key: evaluate(value, doc, variables) for key, value in expression.items()}
+
+
+def apply_expression(operator: str, argument, doc: dict, variables: dict):
+    if operator == "$literal":
+        return argument
+
+    def value(item):
+        result = evaluate(item, doc, variables)
+        return None if result is MISSING else result
+
+    if operator == "$map":
+        items = value(argument["input"]) or []
+        name = argument.get("as", "this")
+        return [
+            evaluate(argument["in"], doc, {**variables, name: item}) for item in items
+        ]
+    if operator == "$filter":
+        items = value(argument["input"]) or []
+        name = argument.get("as", "this")
+        return [
+            item
+            for item in items
+            if evaluate(argument["cond"], doc, {**variables, name: item})
+        ]
+    if operator == "$cond":
+        if isinstance(argument, dict):
+            argument = [argument["if"], argument["then"], argument["else"]]
+        condition, then, otherwise = argument
+        return value(then) if value(condition) else value(otherwise)
+    arguments = argument if isinstance(argument, list) else [argument]
+    if operator == "$ifNull":
+        for item in arguments:
+            result = value(item)
+            if result is not None:
+                return result
+        return None
+    values = [value(item) for item in arguments]
+    if operator in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        order = (type_rank(values[0]), type_rank(values[1]))
+        result = compare(values[0], values[1]) if order[0] == order[1] else None
+        if result is None:
+            result = order[0] - order[1] or int(values[0] != values[1])
+        result = (result > 0) - (result < 0)
+        return {
+            "$eq": result == 0,
+            "$ne": result != 0,
+            "$gt": result > 0,
+            "$gte": result >= 0,
+            "$lt": result < 0,
+            "$lte": result <= 0,
+        }[operator]
+    if operator == "$in":
+        return any(compare(values[0], item) == 0 for item in values[1] or [])
+    if operator == "$and":
+        return all(values)
+    if operator == "$or":
+        return any(values)
+    if operator == "$not":
+        return not values[0]
+    if operator == "$size":
+        return len(values[0])
+    if operator == "$concatArrays":
+        return [item for items in values for item in items or []]
+    if operator == "$mergeObjects":
+        merged = {}
+        for item in values:
+            merged.update(item or {})
+        return merged
+    if operator in ("$sum", "$max", "$min", "$avg"):
+        if len(values) == 1 and isinstance(values[0], list):
+            values = values[0]
+        numbers = [
+            item
+            for item in values
+            if isinstance(item, (int, float)) and not isinstance(item, bool)
+        ]
+        if operator == "$sum":
+            return sum(numbers)
+        if not numbers:
+            return None
+        if operator == "$avg":
+            return sum(numbers) / len(numbers)
+        return max(numbers) if operator == "$max" else min(numbers)
+    if operator == "$add":
+        return sum(values)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$multiply":
+        result = 1
+        for item in values:
+            result *= item
+        return result
+    if operator == "$divide":
+        return values[0] / values[1]
+    raise OperationFailure(f"Unsupported expression operator {operator}")
+
+
+def apply_update(doc: dict, update, inserting: bool = False) -> dict:
+    """Return the updated copy of ``doc``."""
+    doc = copy.deepcopy(doc)
+    if isinstance(update, list):
+        for stage in update:
+            ((name, spec),) = stage.items()
+            if name in ("$set", "$addFields"):
+                values = {key: evaluate(value, doc, {}) for key, value in spec.items()}
+                for key, value in values.items():
+                    if value is MISSING:
+                        unset_path(doc, key)
+                    else:
+                        set_path(doc, key, value)
+            elif name == "$unset":
+                for key in [spec] if isinstance(spec, str) else spec:
+                    unset_path(doc, key)
+            else:
+                raise OperationFailure(f"Unsupported pipeline stage {name}")
+        return doc
+    for operator, fields in update.items():
+        for key, value in fields.items():
+            if operator == "$set" or (operator == "$setOnInsert" and inserting):
+                set_path(doc, key, copy.deepcopy(value))
+            elif operator == "$setOnInsert":
+                continue
+            elif operator == "$unset":
+                unset_path(doc, key)
+            elif operator == "$inc":
+                current = get_path(doc, key)
+                set_path(doc, key, (0 if current is MISSING else current) + value)
+            elif operator == "$push":
+                current = get_path(doc, key)
+                items = [] if current is MISSING else list(current)
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                else:
+                    items.append(copy.deepcopy(value))
+                set_path(doc, key, items)
+            elif operator == "$addToSet":
+                current = get_path(doc, key)
+                items = [] if current is MISSING else list(current)
+                if value not in items:
+                    items.append(copy.deepcopy(value))
+                set_path(doc, key, items)
+            elif operator == "$pull":
+                current = get_path(doc, key)
+                if isinstance(current, list):
+                    set_path(
+                        doc,
+                        key,
+                        [item for item in current if not pulled(item, value)],
+                    )
+            else:
+                raise OperationFailure(f"Unsupported update operator {operator}")
+    return doc
+
+
+def pulled(item, condition) -> bool:
+    if isinstance(condition, dict) and isinstance(item, dict):
+        return matches(item, condition)
+    return match_condition([item], condition)
+
+
+def project(doc: dict, projection, score: float | None = None) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    meta = {
+        key: score
+        for key, value in projection.items()
+        if isinstance(value, dict) and value.get("$meta") == "textScore"
+    }
+    fields = {key: value for key, value in projection.items() if key not in meta}
+    included = [key for key, value in fields.items() if value and key != "_id"]
+    if included:
+        result = {}
+        if fields.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for key in included:
+            value = get_path(doc, key)
+            if value is not MISSING:
+                set_path(result, key, copy.deepcopy(value))
+    else:
+        result = copy.deepcopy(doc)
+        for key, value in fields.items():
+            if not value:
+                unset_path(result, key)
+    result.update(meta)
+    return result
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query, projection):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            key_or_list = [(key_or_list, direction or 1)]
+        self._sort = list(key_or_list)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def results(self) -> list[dict]:
+        documents = self.collection.scan(self.query, self._sort)
+        scores = None
+        if "$text" in self.query:
+            scores, documents = self.collection.text_search(
+                self.query["$text"]["$search"], documents
+            )
+        if self._sort and not self.collection.in_id_order(self._sort):
+            documents = list(documents)
+            for key, direction in reversed(self._sort):
+                if isinstance(direction, dict):
+                    documents.sort(key=lambda doc: scores[id(doc)], reverse=True)
+                else:
+                    documents.sort(
+                        key=lambda doc: sort_key(
+                            next(iter(resolve(doc, key)), MISSING)
+                        ),
+                        reverse=direction == -1,
+                    )
+        stop = self._skip + self._limit if self._limit else None
+        return [
+            project(doc, self.projection, scores and scores[id(doc)])
+            for doc in islice(documents, self._skip, stop)
+        ]
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        documents = self.results()
+        return documents if length is None else documents[:length]
+
+    async def __aiter__(self):
+        await asyncio.sleep(0)
+        for document in self.results():
+            yield document
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.documents: dict = {}
+        # Ids arrived in ascending order, so dict order is _id order
+        self.ordered = True
+        self.last_id = None
+        # field tuple -> {values: _id}
+        self.unique: dict[tuple, dict] = {}
+        self.text_weights: dict[str, int] = {}
+
+    def in_id_order(self, sort) -> bool:
+        return self.ordered and list(sort) in ([("_id", 1)], [("_id", 1.0)])
+
+    def scan(self, query: dict, sort=()):
+        ids = query.get("_id")
+        if isinstance(ids, dict) and set(ids) == {"$in"}:
+            documents = (self.documents.get(value) for value in ids["$in"])
+            documents = (doc for doc in documents if doc is not None)
+        elif ids is not None and not isinstance(ids, dict):
+            documents = [self.documents[ids]] if ids in self.documents else []
+        else:
+            documents = self.documents.values()
+        return (doc for doc in documents if matches(doc, query))
+
+    def text_search(self, search: str, documents):
+        terms = set(WORD.findall(search.lower()))
+        scores = {}
+        found = []
+        for doc in documents:
+            score = 0.0
+            for field, weight in self.text_weights.items():
+                for value in resolve(doc, field):
+                    if isinstance(value, str):
+                        words = WORD.findall(value.lower())
+                        hits = sum(word in terms for word in words)
+                        if hits:
+                            score += weight * hits / len(words)
+            if score:
+                scores[id(doc)] = score
+                found.append(doc)
+        return scores, found
+
+    def unique_keys(self, doc: dict):
+        for fields in self.unique:
+            values = tuple(next(iter(resolve(doc, field)), None) for field in fields)
+            yield fields, values
+
+    def store(self, doc: dict, old: dict | None = None):
+        if old is not None:
+            for fields, values in self.unique_keys(old):
+                self.unique[fields].pop(values, None)
+        for fields, values in self.unique_keys(doc):
+            if self.unique[fields].get(values, doc["_id"]) != doc["_id"]:
+                if old is not None:
+                    self.store(old)
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} {fields}"
+                )
+        for fields, values in self.unique_keys(doc):
+            self.unique[fields][values] = doc["_id"]
+        if old is None and doc["_id"] not in self.documents:
+            if self.last_id is not None and compare(doc["_id"], self.last_id) != 1:
+                self.ordered = False
+            self.last_id = doc["_id"]
+        self.documents[doc["_id"]] = doc
+
+    def insert(self, doc: dict) -> dict:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name}"
+            )
+        self.store(doc)
+        return doc
+
+    def update(self, query, update, upsert=False, multi=False):
+        matched = modified = 0
+        before = after = None
+        documents = self.scan(query)
+        if not multi:
+            documents = islice(documents, 1)
+        for doc in list(documents):
+            updated = apply_update(doc, update)
+            matched += 1
+            if updated != doc:
+                self.store(updated, doc)
+                modified += 1
+            before, after = before or doc, after or updated
+        upserted_id = None
+        if not matched and upsert:
+            seed = {
+                key: value
+                for key, value in query.items()
+                if not key.startswith("$") and not isinstance(value, dict)
+            }
+            after = self.insert(apply_update(seed, update, inserting=True))
+            upserted_id = after["_id"]
+        return matched, modified, upserted_id, before, after
+
+    async def insert_one(self, document, **kwargs):
+        await asyncio.sleep(0)
+        doc = self.insert(document)
+        document.setdefault("_id", doc["_id"])
+        return InsertOneResult(doc["_id"], True)
+
+    async def insert_many(self, documents, ordered=True, **kwargs):
+        await asyncio.sleep(0)
+        ids = []
+        for document in documents:
+            doc = self.insert(document)
+            document.setdefault("_id", doc["_id"])
+            ids.append(doc["_id"])
+        return InsertManyResult(ids, True)
+
+    def watch(self, *args, **kwargs):
+        # Like a standalone mongod
+        raise OperationFailure(
+            "The $changeStream stage is only supported on replica sets", code=40573
+        )
+
+    def find(self, filter=None, projection=None, **kwargs):
+        return FakeCursor(self, filter, projection)
+
+    async def find_one(self, filter=None, projection=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        documents = await self.find(filter, projection).limit(1).to_list()
+        return documents[0] if documents else None
+
+    async def count_documents(self, filter, **kwargs):
+        await asyncio.sleep(0)
+        if "$text" in filter:
+            return len(
+                self.text_search(filter["$text"]["$search"], self.scan(filter))[1]
+            )
+        return sum(1 for _ in self.scan(filter))
+
+    async def estimated_document_count(self, **kwargs):
+        await asyncio.sleep(0)
+        return len(self.documents)
+
+    async def update_one(self, filter, update, upsert=False, **kwargs):
+        await asyncio.sleep(0)
+        matched, modified, upserted_id, _, _ = self.update(filter, update, upsert)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def update_many(self, filter, update, upsert=False, **kwargs):
+        await asyncio.sleep(0)
+        matched, modified, upserted_id, _, _ = self.update(filter, update, upsert, True)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def find_one_and_update(
+        self,
+        filter,
+        update,
+        projection=None,
+        return_document=ReturnDocument.BEFORE,
+        upsert=False,
+        **kwargs,
+    ):
+        await asyncio.sleep(0)
+        _, _, _, before, after = self.update(filter, update, upsert)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return project(doc, projection) if doc is not None else None
+
+    async def delete_one(self, filter, **kwargs):
+        await asyncio.sleep(0)
+        return DeleteResult({"n": self.delete(filter, multi=False)}, True)
+
+    async def delete_many(self, filter, **kwargs):
+        await asyncio.sleep(0)
+        return DeleteResult({"n": self.delete(filter, multi=True)}, True)
+
+    def delete(self, query, multi: bool) -> int:
+        deleted = 0
+        documents = self.scan(query)
+        if not multi:
+            documents = islice(documents, 1)
+        for doc in list(documents):
+            for fields, values in self.unique_keys(doc):
+                self.unique[fields].pop(values, None)
+            del self.documents[doc["_id"]]
+            deleted += 1
+        return deleted
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        await asyncio.sleep(0)
+        result = {
+            "writeErrors": [],
+            "writeConcernErrors": [],
+            "nInserted": 0,
+            "nUpserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nRemoved": 0,
+            "upserted": [],
+        }
+        for index, request in enumerate(requests):
+            name = type(request).__name__
+            try:
+                if name == "InsertOne":
+                    self.insert(request._doc)
+                    result["nInserted"] += 1
+                elif name in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                    if name == "ReplaceOne":
+                        matched, modified, upserted_id = self.replace(
+                            request._filter, request._doc, request._upsert
+                        )
+                    else:
+                        matched, modified, upserted_id, _, _ = self.update(
+                            request._filter,
+                            request._doc,
+                            request._upsert,
+                            name == "UpdateMany",
+                        )
+                    result["nMatched"] += matched
+                    result["nModified"] += modified
+                    if upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": upserted_id})
+                elif name in ("DeleteOne", "DeleteMany"):
+                    result["nRemoved"] += self.delete(
+                        request._filter, name == "DeleteMany"
+                    )
+            except DuplicateKeyError as error:
+                result["writeErrors"].append(
+                    {"index": index, "code": 11000, "errmsg": str(error)}
+                )
+                if ordered:
+                    break
+        return BulkWriteResult(result, True)
+
+    def replace(self, query, replacement, upsert=False):
+        for doc in list(self.scan(query)):
+            updated = {**copy.deepcopy(replacement), "_id": doc["_id"]}
+            self.store(updated, doc)
+            return 1, int(updated != doc), None
+        if upsert:
+            return 0, 0, self.insert(replacement)["_id"]
+        return 0, 0, None
+
+    async def create_indexes(self, indexes, **kwargs):
+        await asyncio.sleep(0)
+        names = []
+        for index in indexes:
+            document = index.document
+            keys = list(document["key"].items())
+            if any(kind == "text" for _, kind in keys):
+                weights = document.get("weights", {})
+                self.text_weights = {
+                    field: weights.get(field, 1)
+                    for field, kind in keys
+                    if kind == "text"
+                }
+            elif document.get("unique"):
+                fields = tuple(field for field, _ in keys)
+                self.unique[fields] = {}
+                for doc in self.documents.values():
+                    self.unique[fields][
+                        tuple(next(iter(resolve(doc, f)), None) for f in fields)
+                    ] = doc["_id"]
+            names.append(document["name"])
+        return names
+
+
+class FakeDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self.collections: dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+            self.collections[name].database = self
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, **kwargs):
+        await asyncio.sleep(0)
+        if command in ("ping", {"ping": 1}):
+            return {"ok": 1.0}
+        raise OperationFailure(f"Command not supported by the fake: {command}")
+
+
+class FakeMongoClient:
+    def __init__(self, *args, **kwargs):
+        self.databases: dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self.databases:
+            self.databases[name] = FakeDatabase(name)
+        return self.databases[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,61 @@
+"""
+    Synthetic book documents shared by the benchmarks, so every one of them
+    measures the same shape of data.
+"""
+import random
+from datetime import datetime
+
+from bson import ObjectId
+
+# Varied text, repeating one sentence would compress unrealistically well
+WORDS = (
+    "một cuốn sách rất hay về tuổi thơ tình bạn gia đình cuộc sống những câu "
+    "chuyện nhẹ nhàng sâu sắc tác giả kể lại ký ức làng quê mùa hè năm ấy "
+    "đôi mắt biếc"
+).split()
+AUTHORS = [
+    f"{first} {last}"
+    for first in ("Nguyễn", "Trần", "Lê", "Phạm", "Hoàng")
+    for last in ("An", "Bình", "Chi", "Dũng", "Giang", "Hà", "Khánh", "Lan")
+]
+CATEGORIES = [
+    "Văn học",
+    "Kinh tế",
+    "Thiếu nhi",
+    "Lịch sử",
+    "Khoa học",
+    "Tâm lý",
+    "Ngoại ngữ",
+    "Truyện tranh",
+]
+
+
+def sentence(words: int, rng=random) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def make_book(index: int, rng=random, ratings: int = 20, user_ids=None) -> dict:
+    """A book as stored in Mongo, before prepare_book adds the derived fields.
+
+    Ratings are left by ``user_ids`` when given, by unknown users otherwise.
+    """
+    return {
+        "_id": ObjectId(),
+        "title": f"{sentence(3, rng).capitalize()} {index}",
+        "author": rng.choice(AUTHORS),
+        "describe": sentence(180, rng),
+        "release_date": f"{rng.randint(1990, 2023)}-{rng.randint(1, 12):02}-01",
+        "page_number": rng.randint(80, 900),
+        "category": rng.choice(CATEGORIES),
+        "cover": f"static/bookscover/{index}.jpg",
+        "price": rng.randint(20, 500) * 1000,
+        "created_at": datetime.now(),
+        "rating": [
+            {
+                "user_id": rng.choice(user_ids) if user_ids else ObjectId(),
+                "rate": rng.randint(1, 5),
+                "comment": sentence(12, rng),
+            }
+            for _ in range(ratings)
+        ],
+    }
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 
 from pydantic import AnyHttpUrl, BaseSettings
 
@@ -13,16 +13,105 @@ class Settings(BaseSettings):
     # APP_HOST: str = "0.0.0.0"
     APP_HOST: str = "localhost"
     APP_PORT: int = 8000
+    # "development" runs one auto-reloading process on APP_HOST, "production"
+    # one uvloop/httptools worker per core (SERVER_WORKERS=0) on SERVER_HOST
+    SERVER_MODE: str = "development"
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_WORKERS: int = 0
+    SERVER_LOOP: str = "uvloop"
+    SERVER_HTTP: str = "httptools"
+    # Longer than the load balancer idle timeout, so it never reuses a
+    # connection the worker is closing
+    SERVER_KEEP_ALIVE: int = 65
+    SERVER_BACKLOG: int = 2048
+    # Per worker, connections and tasks above it get a 503 (0 disables)
+    SERVER_LIMIT_CONCURRENCY: int = 1000
+    # Seconds in-flight requests get to finish after SIGTERM
+    SERVER_GRACEFUL_TIMEOUT: int = 30
     APP_STATIC_DIR: str = "static"
+    # Fingerprinted and content addressed files never change once served
+    STATIC_IMMUTABLE_MAX_AGE: int = 31536000
+    STATIC_MAX_AGE: int = 3600
+    STATIC_FINGERPRINT_URLS: bool = True
+    UPLOAD_MAX_SIZE: int = 5 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024
+    # Resized WebP copies of covers/avatars, built on a process pool
+    IMAGE_VARIANTS_ENABLED: bool = True
+    IMAGE_VARIANT_WIDTHS: List[int] = [150, 300, 600]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_WORKERS: int = 2
 
     PRIVATE_KEY: str
     PUBLIC_KEY: str
+    # Must match the key type in secrets: RS512 (RSA) or ES256 (EC P-256)
+    JWT_ALGORITHM: str = "RS512"
+    # Verified tokens are cached so repeat requests skip the signature check
+    JWT_CACHE_SIZE: int = 10000
+    JWT_CACHE_TTL: float = 300
 
     MONGO_DETAILS: str = "mongodb://localhost:27017/"
     DATABASE_NAME: str = "books_db"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 5
+    MONGO_MAX_IDLE_TIME_MS: int = 60000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 30000
+    # Comma separated: zlib is built in, snappy/zstd need python-snappy/zstandard
+    MONGO_COMPRESSORS: str = "zlib"
+
+    # total_record counts are cached per filter for a few seconds
+    COUNT_CACHE_SIZE: int = 1024
+    COUNT_CACHE_TTL: float = 5
+    # Read-through cache of single book/user lookups. Each worker holds its
+    # own copy, so CACHE_TTL bounds how stale another worker's write can be
+    CACHE_ENABLED: bool = True
+    CACHE_SIZE: int = 10000
+    CACHE_TTL: float = 30
+    # Use the collection metadata count for listings without any filter
+    COUNT_ESTIMATE_UNFILTERED: bool = False
 
     ROOT_PATH: str = ""
 
+    # brotli/gzip for JSON responses, static files keep their own encodings
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 4
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_EXCLUDE_PATHS: List[str] = ["/static"]
+
+    # Prometheus exposition of request, Mongo command, bcrypt and cache metrics
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
+
+    # API_LOG goes through a queue and is written by a background thread.
+    # LOG_SAMPLING keeps a fraction per level ({"DEBUG": 0.1}), LOG_RATE_LIMIT
+    # caps records per call site and second (0 disables), errors always pass
+    LOG_LEVEL: str = "DEBUG"
+    LOG_FORMAT: str = "json"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLING: Dict[str, float] = {}
+    LOG_RATE_LIMIT: int = 100
+    LOG_ACCESS: bool = False
+
+    # Books list/detail served from an in-process copy of the collection, kept
+    # fresh by a change stream (replica sets) or by reloading it periodically
+    CATALOG_REPLICA_ENABLED: bool = False
+    CATALOG_CHANGE_STREAMS: bool = True
+    CATALOG_POLL_INTERVAL: int = 30
+    CATALOG_MAX_STALENESS: int = 120
+
+    # Commands slower than SLOW_QUERY_MS (0 disables) are logged and explained
+    SLOW_QUERY_MS: int = 100
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_MAX_SHAPES: int = 500
+
+    # bcrypt runs on a bounded "thread" or "process" pool, off the event loop
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,82 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Awaitable, Callable
+
+from PIL import Image, ImageOps
+
+from core.config import settings
+from core.logging import logger
+
+VARIANTS_FOLDER = "variants"
+
+_executor: Executor | None = None
+# Running derivative jobs, referenced so they are not garbage collected
+_tasks: set[asyncio.Task] = set()
+
+
+def make_variants(path: str, widths: list[int], quality: int) -> dict[str, str]:
+    """Write WebP copies of ``path`` at each width into a variants/ folder.
+
+    Runs in a worker process. Sources are content addressed, so variants that
+    already exist are reused. Widths larger than the source are skipped.
+    """
+    folder, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    os.makedirs(os.path.join(folder, VARIANTS_FOLDER), exist_ok=True)
+    variants = {}
+    with Image.open(path) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+        for width in sorted(widths):
+            if width >= source.width and variants:
+                break
+            target = os.path.join(folder, VARIANTS_FOLDER, f"{stem}_{width}.webp")
+            if not os.path.exists(target):
+                image = source.copy()
+                image.thumbnail((width, width * 10), Image.LANCZOS)
+                image.save(target, "WEBP", quality=quality, method=4)
+            variants[str(width)] = target.replace(os.sep, "/")
+    return variants
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def build_variants(path: str) -> dict[str, str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        make_variants,
+        path,
+        settings.IMAGE_VARIANT_WIDTHS,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+def queue_variants(path: str, on_done: Callable[[dict[str, str]], Awaitable]):
+    """Build variants in the background, then hand their URLs to ``on_done``."""
+    if not settings.IMAGE_VARIANTS_ENABLED:
+        return
+
+    async def run():
+        try:
+            await on_done(await build_variants(path))
+        except Exception as error:
+            logger.error(f"Cannot build image variants for {path}: {error}")
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,196 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.cache import TTLCache
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ["collection", "command"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command"]
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash/verify latency including pool queueing",
+    ["operation"],
+)
+
+# Caches reported by CacheCollector, registered by the modules owning them
+CACHES: dict[str, TTLCache] = {}
+
+
+def register_cache(name: str, cache: TTLCache):
+    CACHES[name] = cache
+
+
+class CacheCollector:
+    """Reads TTLCache counters at scrape time, so lookups pay nothing extra.
+
+    With several workers only the scraped one is read, ``worker`` labels its
+    series so they do not look like one counter going up and down.
+    """
+
+    def __init__(self, worker: str | None = None):
+        self.worker = worker
+
+    def collect(self):
+        labels = ["cache", "worker"] if self.worker else ["cache"]
+        metrics = {
+            "hits": CounterMetricFamily("cache_hits", "Cache hits", labels=labels),
+            "misses": CounterMetricFamily(
+                "cache_misses", "Cache misses", labels=labels
+            ),
+            "evictions": CounterMetricFamily(
+                "cache_evictions", "Cache evictions", labels=labels
+            ),
+            "size": GaugeMetricFamily("cache_size", "Cached entries", labels=labels),
+        }
+        extra = [self.worker] if self.worker else []
+        for name, cache in CACHES.items():
+            for stat, value in cache.stats().items():
+                if stat in metrics:
+                    metrics[stat].add_metric([name, *extra], value)
+        yield from metrics.values()
+
+
+REGISTRY.register(CacheCollector())
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records per collection and command latency of every Mongo command."""
+
+    def __init__(self):
+        self._collections: dict[tuple, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if isinstance(collection, str):
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+        MONGO_LATENCY.labels(collection, event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+
+class MetricsMiddleware:
+    """Per route request count, latency histogram and in-flight gauge.
+
+    Routes are labelled with their path template ("/books/{id}"), so label
+    cardinality stays bounded. The template is matched before the request
+    runs, the in-flight gauge needs it up front.
+    """
+
+    def __init__(self, app: ASGIApp, routes_app=None):
+        self.app = app
+        self.routes_app = routes_app
+
+    def route_template(self, scope: Scope) -> str:
+        # Same order as the router, only the path regex and the method are
+        # checked (route.matches also converts the parameters, ~5x slower).
+        # A path matching with another method is a 405 on that route
+        path, method = scope["path"], scope["method"]
+        partial = None
+        routes = self.routes_app.routes if self.routes_app is not None else []
+        for route in routes:
+            regex = getattr(route, "path_regex", None)
+            if regex is None or not regex.match(path):
+                continue
+            methods = getattr(route, "methods", None)
+            if methods is None or method in methods:
+                return route.path
+            if partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = self.route_template(scope)
+        status_code = 500
+        in_progress = IN_PROGRESS.labels(method, route)
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+
+
+def multiprocess_enabled() -> bool:
+    """Set by the production server when it runs more than one worker."""
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def scrape_registry() -> CollectorRegistry:
+    if not multiprocess_enabled():
+        return REGISTRY
+    # Metric values of all workers are kept in files, merged at scrape time
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(CacheCollector(worker=str(os.getpid())))
+    return registry
+
+
+def mark_worker_dead():
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(
+        generate_latest(scrape_registry()),
+        headers={"Content-Type": CONTENT_TYPE_LATEST},
+    )
@@ -0,0 +1,102 @@
+"""
+    Production launcher: one uvloop/httptools worker per core sharing one
+    listening socket, each worker building its own Mongo client, pools and
+    caches at startup.
+"""
+import glob
+import os
+import shutil
+import tempfile
+import threading
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from core.config import settings
+from core.logging import logger
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server whose drain on SIGTERM lasts at most ``graceful_timeout``.
+
+    uvicorn stops accepting, closes idle keep-alive connections and waits for
+    the requests in flight. Past the timeout the rest are dropped, but the app
+    shutdown handlers still run so pools are closed and logs flushed.
+    """
+
+    def __init__(self, config: uvicorn.Config, graceful_timeout: float):
+        super().__init__(config)
+        self.graceful_timeout = graceful_timeout
+        self.drain_expired = False
+        self.drain_timer: threading.Timer | None = None
+
+    def handle_exit(self, sig, frame):
+        if self.drain_timer is None and self.graceful_timeout > 0:
+            self.drain_timer = threading.Timer(self.graceful_timeout, self.expire)
+            self.drain_timer.daemon = True
+            self.drain_timer.start()
+        super().handle_exit(sig, frame)
+
+    def expire(self):
+        connections = len(self.server_state.connections)
+        logger.warning(
+            f"Graceful shutdown timed out, dropping {connections} connections"
+        )
+        self.drain_expired = True
+        self.force_exit = True
+
+    async def shutdown(self, sockets=None):
+        await super().shutdown(sockets=sockets)
+        if self.drain_timer is not None:
+            self.drain_timer.cancel()
+        if self.drain_expired:
+            # uvicorn skips the lifespan shutdown once forced
+            await self.lifespan.shutdown()
+
+
+def prepare_metrics_dir() -> str | None:
+    """Share Prometheus values between workers through files in one folder.
+
+    Must run before the workers import core.metrics, they inherit the variable.
+    Returns the folder when it is a temporary one to remove afterwards.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    created = None
+    if not path:
+        path = created = tempfile.mkdtemp(prefix="prometheus-")
+    os.makedirs(path, exist_ok=True)
+    # Values left by a previous run would be added to the new ones
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return created
+
+
+def serve(app: str):
+    workers = settings.SERVER_WORKERS or os.cpu_count() or 1
+    metrics_dir = None
+    if workers > 1 and settings.METRICS_ENABLED:
+        metrics_dir = prepare_metrics_dir()
+    config = uvicorn.Config(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.APP_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY or None,
+        # RequestLogMiddleware writes the access log when LOG_ACCESS is set
+        access_log=False,
+        server_header=False,
+    )
+    server = DrainingServer(config, settings.SERVER_GRACEFUL_TIMEOUT)
+    if config.workers > 1:
+        # Workers are spawned, not forked: each imports the app from scratch
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    else:
+        server.run()
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import re
+from email.utils import formatdate
+from mimetypes import guess_type
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+from core.compression import negotiate
+from core.config import settings
+
+# Uploads are stored as <sha256><ext> and their variants as <sha256>_<width>.webp
+CONTENT_ADDRESSED = re.compile(r"(^|/)[0-9a-f]{64}(_\d+)?\.\w+$")
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+class StaticManifest:
+    """Maps logical static paths to fingerprinted ones (foo.jpg -> foo.<hash>.jpg).
+
+    Built once at startup. Content addressed uploads are already unique per
+    content and map to themselves.
+    """
+
+    def __init__(self):
+        self.fingerprinted: dict[str, str] = {}
+        self.logical: dict[str, str] = {}
+        self.etags: dict[str, str] = {}
+        # Logical path -> encodings with a precompressed sibling on disk
+        self.encodings: dict[str, set[str]] = {}
+
+    def build(self, directory: str):
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.startswith(".") or name.endswith((".br", ".gz", ".part")):
+                    continue
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                self.encodings[path] = {
+                    encoding
+                    for encoding, suffix in PRECOMPRESSED.items()
+                    if os.path.exists(full_path + suffix)
+                }
+                if CONTENT_ADDRESSED.search(path):
+                    continue
+                sha256 = hashlib.sha256()
+                with open(full_path, "rb") as file:
+                    while chunk := file.read(1024 * 1024):
+                        sha256.update(chunk)
+                digest = sha256.hexdigest()[:16]
+                stem, extension = os.path.splitext(path)
+                fingerprinted = f"{stem}.{digest}{extension}"
+                self.fingerprinted[path] = fingerprinted
+                self.logical[fingerprinted] = path
+                self.etags[path] = digest
+
+    def url(self, path: str) -> str:
+        """Fingerprinted form of a path relative to the static directory."""
+        return self.fingerprinted.get(path, path)
+
+    def is_immutable(self, path: str) -> bool:
+        return path in self.logical or bool(CONTENT_ADDRESSED.search(path))
+
+
+manifest = StaticManifest()
+
+
+def static_url(url: str) -> str:
+    """Public URL for a stored path, which lives under APP_STATIC_DIR."""
+    prefix = settings.APP_STATIC_DIR.replace(os.sep, "/").rstrip("/") + "/"
+    if not isinstance(url, str) or not url.startswith(prefix):
+        return url
+    path = url[len(prefix) :]
+    if settings.STATIC_FINGERPRINT_URLS:
+        path = manifest.url(path)
+    # Where main.py mounts the static files
+    return f"static/{path}"
+
+
+def static_urls(variants) -> dict:
+    """static_url of every path in a {width: path} variants map."""
+    if not isinstance(variants, dict):
+        return variants
+    return {width: static_url(path) for width, path in variants.items()}
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that only sends bytes ``start``..``end`` (inclusive)."""
+
+    def __init__(self, path, start: int, end: int, size: int, **kwargs):
+        super().__init__(path, status_code=206, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": more_body,
+                    }
+                )
+                if not chunk:
+                    break
+
+
+def parse_range(value: str, size: int) -> tuple[int, int] | None:
+    """Parse a single "bytes=a-b" range; None means serve the whole file."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", value.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with cache headers, strong ETags, ranges and .br/.gz siblings."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        path = path.replace(os.sep, "/")
+        scope["static_immutable"] = manifest.is_immutable(path)
+        scope["static_path"] = manifest.logical.get(path, path)
+        return await super().get_response(scope["static_path"], scope)
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code=200):
+        path = scope.get("static_path", "")
+        request_headers = Headers(scope=scope)
+        method = scope["method"]
+        if scope.get("static_immutable"):
+            max_age = settings.STATIC_IMMUTABLE_MAX_AGE
+            cache_control = f"public, max-age={max_age}, immutable"
+        else:
+            cache_control = f"public, max-age={settings.STATIC_MAX_AGE}"
+        if path in manifest.etags:
+            etag = f'"{manifest.etags[path]}"'
+        elif CONTENT_ADDRESSED.search(path):
+            etag = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+        else:
+            etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        headers = {
+            "cache-control": cache_control,
+            "accept-ranges": "bytes",
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        }
+        media_type = guess_type(full_path)[0] or "application/octet-stream"
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and status_code == 200 and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, stat_result.st_size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={"content-range": f"bytes */{stat_result.st_size}"},
+                )
+            if byte_range is not None:
+                return RangeFileResponse(
+                    full_path,
+                    *byte_range,
+                    stat_result.st_size,
+                    headers={**headers, "etag": etag},
+                    media_type=media_type,
+                    method=method,
+                )
+
+        encodings = manifest.encodings.get(path, set())
+        headers["vary"] = "Accept-Encoding"
+        encoding = negotiate(
+            request_headers.get("accept-encoding", ""),
+            tuple(encoding for encoding in PRECOMPRESSED if encoding in encodings),
+        )
+        if encoding is not None:
+            full_path = f"{full_path}{PRECOMPRESSED[encoding]}"
+            stat_result = os.stat(full_path)
+            headers["content-encoding"] = encoding
+            etag = f'{etag[:-1]}-{encoding}"'
+        headers["etag"] = etag
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+            method=method,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, Request, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def check_upload_size(request: Request):
+    """Reject oversized uploads from Content-Length before they are copied.
+
+    FastAPI parses the multipart body before running dependencies, so by now
+    Starlette has spooled it (to a temp file past 1 MB) whatever its size.
+    This only spares the copy into static/, the request body itself has to be
+    capped in front of the app (e.g. nginx client_max_body_size).
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
+
+
+async def save_upload(file: UploadFile, folder: str) -> str:
+    """Copy an upload into APP_STATIC_DIR/<folder>/<sha256><ext>, return its path.
+
+    The upload has already been spooled by Starlette, it is copied in chunks
+    hashed and written off the event loop, stopping at UPLOAD_MAX_SIZE.
+    Identical files share one name, the client filename is only used for its
+    extension.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported file type",
+        )
+    directory = os.path.join(settings.APP_STATIC_DIR, folder)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.UPLOAD_MAX_SIZE:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="File too large",
+                    )
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        name = f"{digest.hexdigest()}{extension}"
+        await run_in_threadpool(os.replace, temp_path, os.path.join(directory, name))
+    except BaseException:
+        await run_in_threadpool(os.remove, temp_path)
+        raise
+    return os.path.join(directory, name).replace(os.sep, "/")
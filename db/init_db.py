@@ -1,21 +1,93 @@
+import asyncio
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
 
 from core.config import settings
+from core.logging import logger
+from core.metrics import MongoCommandListener
+from db.slow_queries import SlowQueryListener, slow_query_log
+
+db_client: AsyncIOMotorClient | None = None
+
+# Indexes declared by the service modules, created by ensure_indexes()
+INDEXES: dict[str, list[IndexModel]] = {}
 
-db_client = AsyncIOMotorClient(settings.MONGO_DETAILS)
-database = db_client[settings.DATABASE_NAME]
+
+def create_client() -> AsyncIOMotorClient:
+    listeners = []
+    if settings.METRICS_ENABLED:
+        listeners.append(MongoCommandListener())
+    if settings.SLOW_QUERY_MS > 0:
+        listeners.append(SlowQueryListener(slow_query_log))
+    return AsyncIOMotorClient(
+        settings.MONGO_DETAILS,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        compressors=settings.MONGO_COMPRESSORS or None,
+        event_listeners=listeners,
+    )
+
+
+def get_database():
+    global db_client
+    if db_client is None:
+        db_client = create_client()
+    return db_client[settings.DATABASE_NAME]
 
 
 async def connect_db():
     """Create database connection."""
-    global db_client
-    db_client = AsyncIOMotorClient(settings.MONGO_DETAILS)
+    get_database()
+    slow_query_log.bind(asyncio.get_running_loop(), db_client)
+    await ensure_indexes()
 
 
 async def close_db():
     """Close database connection."""
-    db_client.close()
+    global db_client
+    if db_client is not None:
+        db_client.close()
+        db_client = None
+
+
+def register_indexes(table: str, indexes: list[IndexModel]):
+    INDEXES.setdefault(table, []).extend(indexes)
+
+
+async def ensure_indexes():
+    """Create the registered indexes, existing ones are left untouched."""
+    database = get_database()
+    for table, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await database[table].create_indexes([index])
+            except PyMongoError as error:
+                # e.g. duplicated titles in old data block a unique index
+                logger.error(
+                    f"Cannot create index {index.document} on {table}: {error}"
+                )
+
+
+class CollectionClient:
+    """Collection handle bound to whichever client is current.
+
+    Modules keep these at import time while the real client is only created
+    by connect_db(), so every request shares the one client it owns.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def __getattr__(self, name):
+        return getattr(get_database()[self.table], name)
 
 
-def get_collection_client(table: str):
-    return database.get_collection(table)
+def get_collection_client(table: str) -> CollectionClient:
+    return CollectionClient(table)
@@ -0,0 +1,213 @@
+import asyncio
+import re
+import threading
+import time
+
+from bson import Regex
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from core.cache import make_key
+from core.config import settings
+from core.logging import logger
+
+# Commands that the server can explain, with the part of the command that
+# carries the user supplied values
+QUERY_FIELDS = {
+    "find": ("filter", "sort"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("query",),
+    "findAndModify": ("query", "sort"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+# Session and transport fields the explain command does not accept
+SKIPPED_FIELDS = {"lsid", "txnNumber", "readConcern", "writeConcern"}
+
+
+def redact(value):
+    """Replace every literal by "?" keeping field names and operators.
+
+    Lists of literals collapse to a single "?" so ``$in`` with 3 or 300 ids
+    is the same shape; lists of documents (``$or``, pipelines) are kept.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return "?"
+    if isinstance(value, (Regex, re.Pattern)):
+        return "/?/"
+    return "?"
+
+
+def query_of(command_name: str, command) -> dict:
+    return {
+        field: redact(command[field])
+        for field in QUERY_FIELDS.get(command_name, ())
+        if field in command
+    }
+
+
+def explain_command(command_name: str, command) -> dict:
+    body = {
+        key: value
+        for key, value in command.items()
+        if not key.startswith("$") and key not in SKIPPED_FIELDS
+    }
+    # A batched update/delete explains its first statement only
+    for field in ("updates", "deletes"):
+        if field in body:
+            body[field] = body[field][:1]
+    return {"explain": body, "verbosity": "queryPlanner"}
+
+
+def plan_summary(plan: dict) -> list[str]:
+    """Flatten a winning plan into its stages, e.g. ["FETCH", "IXSCAN title_1"]."""
+    stages = []
+    pending = [plan]
+    while pending:
+        stage = pending.pop(0)
+        name = stage.get("stage", "?")
+        if stage.get("indexName"):
+            name = f"{name} {stage['indexName']}"
+        stages.append(name)
+        if "inputStage" in stage:
+            pending.append(stage["inputStage"])
+        pending.extend(stage.get("inputStages", []))
+    return stages
+
+
+def find_winning_plan(result) -> dict | None:
+    planner = result.get("queryPlanner")
+    if planner is None:
+        # aggregate puts the planner of its $cursor stage in "stages"
+        for stage in result.get("stages", []):
+            planner = stage.get("$cursor", {}).get("queryPlanner")
+            if planner is not None:
+                break
+    if planner is None:
+        return None
+    return planner.get("winningPlan")
+
+
+class SlowQueryLog:
+    """Slow commands grouped by query shape, each shape explained once.
+
+    pymongo calls the listener from Motor's worker threads, so entries are
+    guarded by a lock and explains are handed to the event loop bound by
+    ``bind()``.
+    """
+
+    def __init__(self, threshold_ms: int, explain: bool = True, max_shapes: int = 500):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self.shapes: dict[str, dict] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.client = None
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop, client):
+        self.loop = loop
+        self.client = client
+
+    def record(self, database_name, collection, command_name, command, duration_ms):
+        query = query_of(command_name, command)
+        shape = make_key(collection, command_name, query).decode()
+        logger.warning(
+            f"Slow query {duration_ms:.1f}ms on {collection}.{command_name}: "
+            f"{shape}"
+        )
+        with self._lock:
+            entry = self.shapes.get(shape)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    return
+                entry = self.shapes[shape] = {
+                    "shape": shape,
+                    "collection": collection,
+                    "command": command_name,
+                    "query": query,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_seen": 0.0,
+                    "plan": None,
+                }
+                explain = self.explain and command_name in QUERY_FIELDS
+            else:
+                explain = False
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = time.time()
+        if explain and self.loop is not None and self.client is not None:
+            body = explain_command(command_name, command)
+            asyncio.run_coroutine_threadsafe(
+                self.capture_plan(entry, database_name, body), self.loop
+            )
+
+    async def capture_plan(self, entry: dict, database_name: str, body: dict):
+        try:
+            result = await self.client[database_name].command(body)
+        except PyMongoError as error:
+            entry["plan"] = {"error": str(error)}
+            return
+        plan = find_winning_plan(result)
+        entry["plan"] = plan_summary(plan) if plan else None
+
+    def report(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            entries = [dict(entry) for entry in self.shapes.values()]
+        for entry in entries:
+            entry["avg_ms"] = entry["total_ms"] / entry["count"]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self.shapes.clear()
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Hands commands slower than the log threshold over to the log."""
+
+    def __init__(self, log: SlowQueryLog):
+        self.log = log
+        self._started: dict[tuple, object] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name != "explain":
+            self._started[(event.connection_id, event.request_id)] = event
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event)
+
+    def _finished(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.log.threshold_ms:
+            return
+        collection = started.command.get(started.command_name)
+        if started.command_name == "getMore":
+            collection = started.command.get("collection")
+        if not isinstance(collection, str):
+            return
+        self.log.record(
+            started.database_name,
+            collection,
+            started.command_name,
+            started.command,
+            duration_ms,
+        )
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN, settings.SLOW_QUERY_MAX_SHAPES
+)
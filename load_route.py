@@ -1,6 +1,9 @@
+from app.admin.routers import router as AdminRouter
 from app.auth.routers import router as AuthRouter
 from app.user.routers import router as UsersRouter
 from app.books.routers import router as BooksRouter
+from app.exports.routers import router as ExportsRouter
+from app.imports.routers import router as ImportsRouter
 from app.welcome.router import router as WelcomeRouter
 
 ROUTE_LIST = [
@@ -8,4 +11,7 @@ ROUTE_LIST = [
     {"route": AuthRouter, "tags": ["Xác Thực"], "prefix": ""},
     {"route": UsersRouter, "tags": ["Users"], "prefix": "/user"},
     {"route": BooksRouter, "tags": ["Books"], "prefix": "/books"},
+    {"route": ImportsRouter, "tags": ["Import"], "prefix": "/import"},
+    {"route": ExportsRouter, "tags": ["Export"], "prefix": "/export"},
+    {"route": AdminRouter, "tags": ["Admin"], "prefix": "/admin"},
 ]
@@ -4,12 +4,20 @@ import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi_jwt_auth import AuthJWT
 from fastapi_jwt_auth.exceptions import AuthJWTException
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
+from app.auth.jwt import AuthJWT
+from app.auth.password import shutdown_executor
+from app.books.catalog import catalog
+from core import images
+from core.compression import CompressionMiddleware
 from core.config import settings
+from core.logging import RequestLogMiddleware, stop_logging
+from core.metrics import MetricsMiddleware, mark_worker_dead, metrics_endpoint
+from core.server import serve
+from core.static import CachedStaticFiles, manifest
 from db import init_db
 
 app = FastAPI(title=settings.APP_TITLE, root_path=settings.ROOT_PATH)
@@ -24,10 +32,26 @@ if settings.APP_ORIGINS:
         allow_headers=["*"],
     )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        exclude_paths=tuple(settings.COMPRESSION_EXCLUDE_PATHS),
+    )
+
+app.add_middleware(RequestLogMiddleware, access_log=settings.LOG_ACCESS)
+
+if settings.METRICS_ENABLED:
+    # Outermost, so the latency covers compression and CORS as well
+    app.add_middleware(MetricsMiddleware, routes_app=app)
+    app.add_route(settings.METRICS_PATH, metrics_endpoint, include_in_schema=False)
+
 
 class Settings(BaseModel):
     expires = datetime.timedelta(days=1)
-    authjwt_algorithm: str = "RS512"
+    authjwt_algorithm: str = settings.JWT_ALGORITHM
     authjwt_public_key: str = settings.PUBLIC_KEY
     authjwt_private_key: str = settings.PRIVATE_KEY
     authjwt_access_token_expires: datetime.timedelta = expires
@@ -50,17 +74,28 @@ def auth_exception_handler(request: Request, exc: AuthJWTException):
 @app.on_event("startup")
 async def on_startup():
     await init_db.connect_db()
+    if settings.STATIC_FINGERPRINT_URLS:
+        await run_in_threadpool(manifest.build, settings.APP_STATIC_DIR)
+    if settings.CATALOG_REPLICA_ENABLED:
+        await catalog.start()
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await catalog.stop()
     await init_db.close_db()
+    shutdown_executor()
+    images.shutdown_executor()
+    mark_worker_dead()
+    stop_logging()
 
 
 """
     Start file server for downloading static files.
 """
-app.mount("/static", StaticFiles(directory=settings.APP_STATIC_DIR), name="static")
+app.mount(
+    "/static", CachedStaticFiles(directory=settings.APP_STATIC_DIR), name="static"
+)
 """
     Import and init route list
 """
@@ -70,4 +105,9 @@ for route in ROUTE_LIST:
     app.include_router(route["route"], tags=route["tags"], prefix=route["prefix"])
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host=settings.APP_HOST, port=settings.APP_PORT, reload=True)
+    if settings.SERVER_MODE == "production":
+        serve("main:app")
+    else:
+        uvicorn.run(
+            "main:app", host=settings.APP_HOST, port=settings.APP_PORT, reload=True
+        )
@@ -0,0 +1,53 @@
+"""
+    Build WebP variants for every image already in APP_STATIC_DIR/bookscover
+    and APP_STATIC_DIR/avatar, then record them on the books and users using
+    them.
+
+    python -m scripts.backfill_images
+"""
+import asyncio
+import os
+
+from core import images
+from core.config import settings
+from core.logging import logger
+from db import init_db
+from db.init_db import get_collection_client
+
+FOLDERS = {
+    "bookscover": ("books", "cover", "cover_variants"),
+    "avatar": ("users", "avatar_url", "avatar_variants"),
+}
+
+
+async def backfill_folder(folder: str, table: str, field: str, variants_field: str):
+    client = get_collection_client(table)
+    directory = os.path.join(settings.APP_STATIC_DIR, folder)
+    for name in sorted(os.listdir(directory)):
+        # Same form as the paths save_upload stores
+        path = os.path.join(directory, name).replace(os.sep, "/")
+        if not os.path.isfile(path) or name.startswith("."):
+            continue
+        try:
+            variants = await images.build_variants(path)
+        except Exception as error:
+            logger.error(f"Skipping {path}: {error}")
+            continue
+        result = await client.update_many(
+            {field: path}, {"$set": {variants_field: variants}}
+        )
+        logger.info(
+            f"{path}: {len(variants)} variants, {result.modified_count} documents"
+        )
+
+
+async def main():
+    await init_db.connect_db()
+    for folder, (table, field, variants_field) in FOLDERS.items():
+        await backfill_folder(folder, table, field, variants_field)
+    images.shutdown_executor()
+    await init_db.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
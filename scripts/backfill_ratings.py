@@ -0,0 +1,21 @@
+"""
+    Recompute rating_count, rating_sum and average_rate on every book.
+
+    python -m scripts.backfill_ratings
+"""
+import asyncio
+
+from app.books.services import backfill_rating_aggregates
+from core.logging import logger
+from db import init_db
+
+
+async def main():
+    await init_db.connect_db()
+    modified = await backfill_rating_aggregates()
+    logger.info(f"Backfilled rating aggregates on {modified} books")
+    await init_db.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+"""
+    Fill the normalised search.* fields used by the books text index.
+
+    python -m scripts.backfill_search
+"""
+import asyncio
+
+from app.books.services import backfill_search_fields
+from core.logging import logger
+from db import init_db
+
+
+async def main():
+    await init_db.connect_db()
+    updated = await backfill_search_fields()
+    logger.info(f"Backfilled search fields on {updated} books")
+    await init_db.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+    Bulk import books or users from a JSON array or NDJSON file, e.g. the
+    books_db.books.json / books_db.users.json dumps from the README.
+
+    python -m scripts.import_data books books_db.books.json [--mode upsert]
+"""
+import argparse
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.password import shutdown_executor
+from app.imports.models import ImportMode
+from app.imports.services import import_documents
+from core.logging import logger
+from db import init_db
+
+CHUNK_SIZE = 1024 * 1024
+
+
+async def read_chunks(path: str):
+    with open(path, "rb") as file:
+        while chunk := await run_in_threadpool(file.read, CHUNK_SIZE):
+            yield chunk
+
+
+async def log_progress(report):
+    logger.info(
+        f"{report.processed} rows: {report.inserted} inserted, {report.updated} "
+        f"updated, {report.skipped} skipped, {report.failed} failed"
+    )
+
+
+async def main(args):
+    await init_db.connect_db()
+    report = await import_documents(
+        args.kind,
+        read_chunks(args.path),
+        ImportMode(args.mode),
+        args.batch_size,
+        log_progress,
+    )
+    await log_progress(report)
+    for error in report.errors:
+        logger.error(f"row {error.row}: {error.error}")
+    shutdown_executor()
+    await init_db.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("kind", choices=["books", "users"])
+    parser.add_argument("path")
+    parser.add_argument(
+        "--mode", choices=[mode.value for mode in ImportMode], default="skip"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+
+from app.books.utils import parse_fields
+
+
+def test_child_paths_collapse_into_their_parent():
+    names = parse_fields("title,rating.rate,rating,rating.comment", ["title"], set())
+    assert names == ["title", "rating"]
+
+
+def test_sibling_paths_are_kept():
+    names = parse_fields("cover_variants.150,cover_variants.300", ["title"], set())
+    assert names == ["cover_variants.150", "cover_variants.300"]
+
+
+def test_duplicates_are_dropped():
+    assert parse_fields("title,title", ["title"], set()) == ["title"]
+
+
+@pytest.mark.parametrize("fields", ["rating.", "rating..rate", ".rate", "search.title"])
+def test_invalid_or_hidden_paths_are_rejected(fields):
+    with pytest.raises(HTTPException) as error:
+        parse_fields(fields, ["title"], {"search"})
+    assert error.value.status_code == 400